@@ -0,0 +1,21 @@
+"""add attachments.sha256
+
+Revision ID: a3c5e7f9b1d2
+Revises: f2a9d7c3e8b1
+Create Date: 2025-11-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "a3c5e7f9b1d2"
+down_revision = "f2a9d7c3e8b1"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("attachments", sa.Column("sha256", sa.String(length=64), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column("attachments", "sha256")
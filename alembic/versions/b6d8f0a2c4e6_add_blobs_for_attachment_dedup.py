@@ -0,0 +1,42 @@
+"""add blobs table for content-addressed attachments
+
+Revision ID: b6d8f0a2c4e6
+Revises: a3c5e7f9b1d2
+Create Date: 2025-11-21
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "b6d8f0a2c4e6"
+down_revision = "a3c5e7f9b1d2"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "blobs",
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("storage_key", sa.String(length=1024), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=True),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("sha256"),
+        sa.UniqueConstraint("storage_key", name="uq_blobs_storage_key"),
+    )
+    # batch mode so this also works on SQLite (table rebuild)
+    with op.batch_alter_table("attachments") as batch:
+        # deduplicated attachments share a storage_key
+        batch.drop_constraint("uq_attachments_storage_key", type_="unique")
+        batch.add_column(sa.Column("blob_sha256", sa.String(length=64), nullable=True))
+        batch.create_foreign_key("fk_attachments_blob_sha256", "blobs", ["blob_sha256"], ["sha256"])
+        batch.create_index("ix_attachments_blob_sha256", ["blob_sha256"])
+
+def downgrade() -> None:
+    with op.batch_alter_table("attachments") as batch:
+        batch.drop_index("ix_attachments_blob_sha256")
+        batch.drop_constraint("fk_attachments_blob_sha256", type_="foreignkey")
+        batch.drop_column("blob_sha256")
+        batch.create_unique_constraint("uq_attachments_storage_key", ["storage_key"])
+    op.drop_table("blobs")
@@ -0,0 +1,26 @@
+"""add tasks keyset pagination index
+
+Revision ID: c7e1f0a9b2d4
+Revises: a1b2c3d4e5f6
+Create Date: 2025-11-12
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c7e1f0a9b2d4"
+down_revision = "a1b2c3d4e5f6"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Matches ORDER BY created_at DESC, id DESC and the (created_at, id) < (:c, :id) seek in list_tasks
+    op.create_index(
+        "ix_tasks_created_at_id",
+        "tasks",
+        [sa.text("created_at DESC"), sa.text("id DESC")],
+    )
+
+def downgrade() -> None:
+    op.drop_index("ix_tasks_created_at_id", table_name="tasks")
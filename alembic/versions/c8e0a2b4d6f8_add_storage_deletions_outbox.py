@@ -0,0 +1,33 @@
+"""add storage_deletions outbox
+
+Revision ID: c8e0a2b4d6f8
+Revises: b6d8f0a2c4e6
+Create Date: 2025-11-24
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "c8e0a2b4d6f8"
+down_revision = "b6d8f0a2c4e6"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "storage_deletions",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), autoincrement=True, nullable=False),
+        sa.Column("storage_key", sa.String(length=1024), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("next_attempt_at", sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    # the worker polls "due rows, oldest first"
+    op.create_index("ix_storage_deletions_next_attempt_at", "storage_deletions", ["next_attempt_at"])
+
+def downgrade() -> None:
+    op.drop_index("ix_storage_deletions_next_attempt_at", table_name="storage_deletions")
+    op.drop_table("storage_deletions")
@@ -0,0 +1,21 @@
+"""add attachments.preview_key
+
+Revision ID: d2f4a6c8e0b2
+Revises: c8e0a2b4d6f8
+Create Date: 2025-11-26
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "d2f4a6c8e0b2"
+down_revision = "c8e0a2b4d6f8"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("attachments", sa.Column("preview_key", sa.String(length=1024), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column("attachments", "preview_key")
@@ -0,0 +1,55 @@
+"""add full-text search over tasks
+
+Revision ID: e4b8a2c6d1f3
+Revises: c7e1f0a9b2d4
+Create Date: 2025-11-14
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e4b8a2c6d1f3"
+down_revision = "c7e1f0a9b2d4"
+branch_labels = None
+depends_on = None
+
+# Must match app_db/search.py (TASK_TSVECTOR_SQL / SQLITE_FTS_DDL) exactly
+TASK_TSVECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='rowid')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",
+]
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        # CONCURRENTLY: don't block writes to tasks while the index builds
+        with op.get_context().autocommit_block():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tasks_fts ON tasks USING GIN (({TASK_TSVECTOR_SQL}))")
+    elif dialect == "sqlite":
+        for stmt in SQLITE_FTS_DDL:
+            op.execute(stmt)
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_tasks_fts")
+    elif dialect == "sqlite":
+        for trigger in ("tasks_fts_ai", "tasks_fts_ad", "tasks_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS tasks_fts")
@@ -0,0 +1,32 @@
+"""add tasks.attachment_count / attachment_bytes
+
+Revision ID: e6a8c0e2f4b6
+Revises: d2f4a6c8e0b2
+Create Date: 2025-11-28
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "e6a8c0e2f4b6"
+down_revision = "d2f4a6c8e0b2"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("tasks", sa.Column("attachment_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("tasks", sa.Column("attachment_bytes", sa.BigInteger(), nullable=False, server_default="0"))
+    # Backfill from the existing rows; the app keeps them in sync from here on
+    op.execute(
+        """
+        UPDATE tasks SET
+            attachment_count = (SELECT count(*) FROM attachments a WHERE a.task_id = tasks.id),
+            attachment_bytes = (SELECT coalesce(sum(a.size_bytes), 0) FROM attachments a WHERE a.task_id = tasks.id)
+        WHERE EXISTS (SELECT 1 FROM attachments a WHERE a.task_id = tasks.id)
+        """
+    )
+
+def downgrade() -> None:
+    op.drop_column("tasks", "attachment_bytes")
+    op.drop_column("tasks", "attachment_count")
@@ -0,0 +1,38 @@
+"""add secondary indexes for task filter paths
+
+Revision ID: f2a9d7c3e8b1
+Revises: e4b8a2c6d1f3
+Create Date: 2025-11-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f2a9d7c3e8b1"
+down_revision = "e4b8a2c6d1f3"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    # GET /todos/?status=  ORDER BY created_at DESC, id DESC
+    ("ix_tasks_status_created_at_id", "tasks", ["status", sa.text("created_at DESC"), sa.text("id DESC")]),
+    # FK lookups (user deletes, "created by me")
+    ("ix_tasks_created_by", "tasks", ["created_by"]),
+    # due-date range scans
+    ("ix_tasks_due_at", "tasks", ["due_at"]),
+    # reverse side of the link tables: ?assignee_id= / ?tag_id= (PKs lead with task_id)
+    ("ix_task_assignees_user_id_task_id", "task_assignees", ["user_id", "task_id"]),
+    ("ix_task_tags_tag_id_task_id", "task_tags", ["tag_id", "task_id"]),
+]
+
+def upgrade() -> None:
+    # CONCURRENTLY on Postgres so existing tables stay writable during the build
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
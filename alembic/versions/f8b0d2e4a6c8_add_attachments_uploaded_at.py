@@ -0,0 +1,24 @@
+"""add attachments.uploaded_at
+
+Revision ID: f8b0d2e4a6c8
+Revises: e6a8c0e2f4b6
+Create Date: 2025-12-04
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "f8b0d2e4a6c8"
+down_revision = "e6a8c0e2f4b6"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("attachments", sa.Column("uploaded_at", sa.TIMESTAMP(timezone=True), nullable=True))
+    # Rows with a stored object count as uploaded from when they were created. Pending presigned
+    # or multipart rows can't be told apart here; they are already in the task counters too.
+    op.execute("UPDATE attachments SET uploaded_at = created_at")
+
+def downgrade() -> None:
+    op.drop_column("attachments", "uploaded_at")
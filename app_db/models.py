@@ -1,13 +1,14 @@
 from sqlalchemy import (
     Column, String, Text, Enum, ForeignKey, UniqueConstraint, Index, text, 
-    TIMESTAMP
+    TIMESTAMP, event, inspect, update
 )
+from datetime import datetime, timezone
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 import uuid
 from app_db.database import Base
 from enum import Enum as PyEnum
-from sqlalchemy import BigInteger
+from sqlalchemy import BigInteger, Integer
 
 class TaskStatus(str, PyEnum):
     todo = "todo"
@@ -70,6 +71,18 @@ class Task(Base):
         nullable=False
     )        # auto-updates on row changes
     created_by: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    # Denormalized attachment badge, maintained by the Attachment mapper events below
+    attachment_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    attachment_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Keyset pagination index for GET /todos/ (ORDER BY created_at DESC, id DESC)
+        Index("ix_tasks_created_at_id", created_at.desc(), id.desc()),
+        # ?status= filter with the same ordering
+        Index("ix_tasks_status_created_at_id", "status", created_at.desc(), id.desc()),
+        Index("ix_tasks_created_by", "created_by"),
+        Index("ix_tasks_due_at", "due_at"),
+    )
 
     attachments = relationship("Attachment", back_populates="task", cascade="all, delete-orphan")
     assignees = relationship("User", secondary="task_assignees", backref="tasks")
@@ -95,18 +108,52 @@ class Attachment(Base):
     filename: Mapped[str] = mapped_column(String(512), nullable=False)
     content_type: Mapped[str | None] = mapped_column(String(255), nullable=True)
     size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
-    storage_key: Mapped[str] = mapped_column(String(1024), unique=True, nullable=False)
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)  # hex digest of the content, if known
+    # Content-addressed attachments share one object: several rows may carry the same storage_key
+    storage_key: Mapped[str] = mapped_column(String(1024), nullable=False)
+    # Set when the object is a deduplicated blob (ref-counted); NULL = legacy per-attachment object
+    blob_sha256: Mapped[str | None] = mapped_column(
+        String(64), ForeignKey("blobs.sha256"), nullable=True, index=True,
+    )
+    # Resized image preview written by services/thumbnails.py; NULL = none (yet)
+    preview_key: Mapped[str | None] = mapped_column(String(1024), nullable=True)
+    # NULL while a presigned or multipart upload is pending: such rows are not listed or counted
+    uploaded_at = mapped_column(TIMESTAMP(timezone=True), nullable=True)
     created_at = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"), nullable=False)
 
     # relationships
     task = relationship("Task", back_populates="attachments")
     uploader = relationship("User", backref="uploaded_files")  # ← renamed to avoid conflict
 
+class Blob(Base):
+    """One stored object per distinct content; attachments reference it by hash."""
+    __tablename__ = "blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    storage_key: Mapped[str] = mapped_column(String(1024), unique=True, nullable=False)
+    size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # attachments pointing here
+    created_at = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"), nullable=False)
+
+class StorageDeletion(Base):
+    """Outbox of storage objects to delete; written in the same transaction that orphans them."""
+    __tablename__ = "storage_deletions"
+
+    # SQLite only auto-increments INTEGER PRIMARY KEY
+    id: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    storage_key: Mapped[str] = mapped_column(String(1024), nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"), nullable=False, index=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at = mapped_column(TIMESTAMP(timezone=True), server_default=text("now()"), nullable=False)
+
 class TaskAssignee(Base):
     __tablename__ = "task_assignees"
     task_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
     user_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
     assigned_at = mapped_column(TIMESTAMP(timezone=True), server_default="now()", nullable=False)
+    # PK (task_id, user_id) covers per-task lookups; this covers ?assignee_id= (user -> tasks)
+    __table_args__ = (Index("ix_task_assignees_user_id_task_id", "user_id", "task_id"),)
 
 class Tag(Base):
     __tablename__ = "tags"
@@ -117,4 +164,49 @@ class Tag(Base):
 class TaskTag(Base):
     __tablename__ = "task_tags"
     task_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("tasks.id", ondelete="CASCADE"), primary_key=True)
-    tag_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
\ No newline at end of file
+    tag_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    # PK (task_id, tag_id) covers per-task lookups; this covers ?tag_id= (tag -> tasks)
+    __table_args__ = (Index("ix_task_tags_tag_id_task_id", "tag_id", "task_id"),)
+
+
+# ---------- Denormalized attachment counters on tasks ----------
+# Runs inside the flush that writes the attachment, so the counters commit (or roll back)
+# with it. Bumps updated_at too: the badge is part of the task representation, so ETags move.
+# Core-level bulk writes to attachments bypass this (the only one today is the ON DELETE
+# CASCADE of a task, which takes the counters with it).
+
+def _bump_attachment_counters(connection, task_id, count_delta: int, bytes_delta: int) -> None:
+    connection.execute(
+        update(Task.__table__)
+        .where(Task.__table__.c.id == task_id)
+        .values(
+            attachment_count=Task.__table__.c.attachment_count + count_delta,
+            attachment_bytes=Task.__table__.c.attachment_bytes + bytes_delta,
+            updated_at=datetime.now(timezone.utc),
+        )
+    )
+
+@event.listens_for(Attachment, "after_insert")
+def _attachment_inserted(mapper, connection, target):
+    # Pending uploads (uploaded_at NULL) count once they complete, not at presign/initiate
+    if target.uploaded_at is not None:
+        _bump_attachment_counters(connection, target.task_id, 1, target.size_bytes or 0)
+
+@event.listens_for(Attachment, "after_delete")
+def _attachment_deleted(mapper, connection, target):
+    if target.uploaded_at is not None:
+        _bump_attachment_counters(connection, target.task_id, -1, -(target.size_bytes or 0))
+
+@event.listens_for(Attachment, "after_update")
+def _attachment_updated(mapper, connection, target):
+    if target.uploaded_at is None:
+        return
+    attrs = inspect(target).attrs
+    if attrs.uploaded_at.history.has_changes() and not any(attrs.uploaded_at.history.deleted):
+        # Upload just completed: count it with the size that actually landed
+        _bump_attachment_counters(connection, target.task_id, 1, target.size_bytes or 0)
+        return
+    history = attrs.size_bytes.history
+    if history.has_changes():
+        old = (history.deleted or [None])[0] or 0
+        _bump_attachment_counters(connection, target.task_id, 0, (target.size_bytes or 0) - old)
@@ -0,0 +1,105 @@
+"""
+Connection pool instrumentation.
+
+The engines are built with `instrumented(QueuePool)` (or the async-adapted variant) so every
+checkout is timed: the time spent in `pool.connect()` covers waiting for a free slot, opening
+a new connection when the pool grows, and the pre-ping round trip if enabled.
+Overflow connections (opened beyond pool_size) and checkout timeouts are counted too.
+
+Served as JSON by GET /metrics/db-pool (routers/metrics.py) to size replicas against
+Postgres max_connections: replicas * (pool_size + max_overflow) must stay below it.
+"""
+
+import threading
+import time
+from typing import Dict, Optional, Type
+
+from sqlalchemy import exc
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class PoolMetrics:
+    """Thread-safe counters for one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+        self.connections_opened = 0
+        self.overflow_opened = 0
+        self.timeouts = 0
+
+    def record_checkout(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_seconds_total += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+
+    def record_connect(self, overflow: bool) -> None:
+        with self._lock:
+            self.connections_opened += 1
+            if overflow:
+                self.overflow_opened += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool: Pool) -> Dict:
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "checkout_wait_ms_avg": round(1000 * self.checkout_seconds_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_wait_ms_max": round(1000 * self.checkout_seconds_max, 3),
+                "connections_opened": self.connections_opened,
+                "overflow_opened": self.overflow_opened,
+                "timeouts": self.timeouts,
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "pool_size": pool.size(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return data
+
+
+def instrumented(pool_cls: Type[QueuePool]) -> Type[QueuePool]:
+    """Subclass of a QueuePool class whose checkouts report into `pool.metrics`."""
+
+    class InstrumentedPool(pool_cls):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.metrics = PoolMetrics()
+
+        def _create_connection(self):
+            record = super()._create_connection()
+            # QueuePool bumps its overflow counter before opening; > 0 means beyond pool_size
+            self.metrics.record_connect(overflow=self.overflow() > 0)
+            return record
+
+        def connect(self):
+            start = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                self.metrics.record_timeout()
+                raise
+            finally:
+                self.metrics.record_checkout(time.perf_counter() - start)
+
+        def recreate(self):
+            # engine.dispose() swaps in a fresh pool; keep counting into the same object
+            new_pool = super().recreate()
+            new_pool.metrics = self.metrics
+            return new_pool
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_cls.__name__}"
+    return InstrumentedPool
+
+
+def pool_snapshot(pool: Optional[Pool]) -> Optional[Dict]:
+    metrics = getattr(pool, "metrics", None)
+    return metrics.snapshot(pool) if metrics else None
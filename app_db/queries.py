@@ -0,0 +1,156 @@
+"""
+Read-side query planning for tasks.
+
+Touching `Task.assignees` / `Task.tags` on each row lazy-loads full User/Tag objects
+with one SELECT per task (the classic N+1). For reads we only ever need the IDs,
+so we plan the read in a fixed number of statements instead:
+    1. the task rows themselves (whatever query the router built)
+    2. one SELECT over task_assignees for all task IDs on the page
+    3. one SELECT over task_tags for all task IDs on the page
+    4. (ATTACHMENT_STATS=aggregate) one grouped SELECT over attachments for the page
+"""
+
+import base64
+import binascii
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import Select, func, literal, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from app_db import models as dbm
+
+LinkMap = Dict[UUID, List[UUID]]
+StatsMap = Dict[UUID, Tuple[int, int]]  # task_id -> (attachment_count, attachment_bytes)
+
+
+def link_id_statements(task_ids: List[UUID]) -> Tuple[Select, Select]:
+    # Select only the join-table columns - no User/Tag rows are materialised.
+    return (
+        select(dbm.TaskAssignee.task_id, dbm.TaskAssignee.user_id)
+        .where(dbm.TaskAssignee.task_id.in_(task_ids)),
+        select(dbm.TaskTag.task_id, dbm.TaskTag.tag_id)
+        .where(dbm.TaskTag.task_id.in_(task_ids)),
+    )
+
+
+def _group(rows) -> LinkMap:
+    grouped: LinkMap = defaultdict(list)
+    for task_id, linked_id in rows:
+        grouped[task_id].append(linked_id)
+    return grouped
+
+
+def load_link_ids(db: Session, task_ids: Iterable[UUID]) -> Tuple[LinkMap, LinkMap]:
+    """Return ({task_id: [user_id, ...]}, {task_id: [tag_id, ...]}) for the given tasks."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return defaultdict(list), defaultdict(list)
+    assignees_stmt, tags_stmt = link_id_statements(task_ids)
+    return _group(db.execute(assignees_stmt)), _group(db.execute(tags_stmt))
+
+
+async def load_link_ids_async(db, task_ids: Iterable[UUID]) -> Tuple[LinkMap, LinkMap]:
+    """Awaitable load_link_ids for the handle returned by app_db.session.get_db."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return defaultdict(list), defaultdict(list)
+    assignees_stmt, tags_stmt = link_id_statements(task_ids)
+    return _group(await db.execute(assignees_stmt)), _group(await db.execute(tags_stmt))
+
+
+# ---------- Column-only reads (list fast path) ----------
+
+# Every tasks column TaskRead needs (links come from load_link_ids)
+TASK_READ_COLUMNS = (
+    dbm.Task.id, dbm.Task.title, dbm.Task.description, dbm.Task.status, dbm.Task.priority,
+    dbm.Task.created_at, dbm.Task.due_at, dbm.Task.completed_at, dbm.Task.updated_at,
+    dbm.Task.created_by, dbm.Task.attachment_count, dbm.Task.attachment_bytes,
+)
+
+
+def task_columns(stmt: Select) -> Select:
+    """Same select(Task) - filters, joins, ordering - returning plain rows instead of ORM objects."""
+    return stmt.with_only_columns(*TASK_READ_COLUMNS)
+
+
+# ---------- Attachment badges (count / total size per task) ----------
+
+def attachment_stats_statement(task_ids: List[UUID]) -> Select:
+    # Aggregated in the DB off the attachments.task_id index; tasks without uploaded attachments
+    # simply have no row (callers default to (0, 0)). Same rule as the counters in models.py.
+    return (
+        select(
+            dbm.Attachment.task_id,
+            func.count(dbm.Attachment.id),
+            func.coalesce(func.sum(dbm.Attachment.size_bytes), 0),
+        )
+        .where(dbm.Attachment.task_id.in_(task_ids), dbm.Attachment.uploaded_at.is_not(None))
+        .group_by(dbm.Attachment.task_id)
+    )
+
+
+def _stats(rows) -> StatsMap:
+    return {task_id: (count, int(total)) for task_id, count, total in rows}
+
+
+def load_attachment_stats(db: Session, task_ids: Iterable[UUID]) -> StatsMap:
+    task_ids = list(task_ids)
+    return _stats(db.execute(attachment_stats_statement(task_ids))) if task_ids else {}
+
+
+async def load_attachment_stats_async(db, task_ids: Iterable[UUID]) -> StatsMap:
+    task_ids = list(task_ids)
+    return _stats(await db.execute(attachment_stats_statement(task_ids))) if task_ids else {}
+
+
+# ---------- Keyset (cursor) pagination ----------
+# Tasks are listed newest first, ordered by (created_at, id) so the order is total even
+# when two tasks share a timestamp. The cursor is the sort key of the last row served,
+# and the next page is "rows strictly after that key" - served straight off the
+# ix_tasks_created_at_id index, so page 1000 costs the same as page 1 (no OFFSET scan).
+
+
+def encode_cursor(t) -> str:
+    # t: a Task or a task_columns() row - anything with .created_at and .id
+    raw = f"{t.created_at.isoformat()}|{t.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Inverse of encode_cursor. Raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, task_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(task_id)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_page(stmt: Select, limit: int, cursor: Optional[str] = None) -> Select:
+    """Apply keyset ordering/seek to a select(Task). Fetches limit+1 rows; see split_page."""
+    if cursor:
+        created_at, task_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(dbm.Task.created_at, dbm.Task.id) < tuple_(created_at, task_id))
+    # One extra row tells us whether another page exists
+    return stmt.order_by(dbm.Task.created_at.desc(), dbm.Task.id.desc()).limit(limit + 1)
+
+
+def split_page(rows: List[dbm.Task], limit: int) -> Tuple[List[dbm.Task], Optional[str]]:
+    """Returns (page, next_cursor or None) from the rows fetched by keyset_page."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+# ---------- Reference validation (bulk writes) ----------
+
+def existing_refs_statement(user_ids: Iterable[UUID], tag_ids: Iterable[UUID]) -> Select:
+    """One round trip for both lookups: rows of (id, 'user' | 'tag') for the IDs that exist."""
+    return union_all(
+        select(dbm.User.id, literal("user").label("kind")).where(dbm.User.id.in_(list(user_ids))),
+        select(dbm.Tag.id, literal("tag").label("kind")).where(dbm.Tag.id.in_(list(tag_ids))),
+    )
@@ -0,0 +1,81 @@
+"""
+Full-text search over task title + description.
+
+    • Postgres: GIN expression index over a weighted tsvector (title 'A', description 'B'),
+      queried with websearch_to_tsquery and ranked by ts_rank_cd. The query expression must be
+      byte-for-byte the indexed one (TASK_TSVECTOR_SQL) or the planner won't use the index.
+    • SQLite (local / Lambda): FTS5 external-content table `tasks_fts`, kept in sync by
+      triggers, ranked by bm25.
+    • Anything else: LIKE scan ordered by recency (no index; correctness fallback only).
+"""
+
+from sqlalchemy import DDL, Select, column, event, func, literal_column, or_, select, table
+
+from app_db import models as dbm
+
+# Keep in sync with alembic/versions/e4b8a2c6d1f3_add_tasks_fulltext_search.py
+TASK_TSVECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+    "title, description, content='tasks', content_rowid='rowid')",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE ON tasks BEGIN "
+    "INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); "
+    "INSERT INTO tasks_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+    "INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')",  # backfill existing rows
+]
+
+# create_all() (AUTO_CREATE_TABLES on SQLite) gets the FTS table too
+for _stmt in SQLITE_FTS_DDL:
+    event.listen(dbm.Task.__table__, "after_create", DDL(_stmt).execute_if(dialect="sqlite"))
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input can't hit FTS5 query syntax (AND/OR/NEAR/column filters)
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+def search_statement(dialect: str, q: str, limit: int, offset: int = 0) -> Select:
+    """Ranked select(Task) for `q`; fetches limit+1 rows so callers can tell if there is more."""
+    if dialect == "postgresql":
+        document = literal_column(f"({TASK_TSVECTOR_SQL})")
+        tsquery = func.websearch_to_tsquery(literal_column("'english'::regconfig"), q)
+        stmt = (
+            select(dbm.Task)
+            .where(document.op("@@")(tsquery))
+            .order_by(func.ts_rank_cd(document, tsquery).desc(), dbm.Task.id)
+        )
+    elif dialect == "sqlite":
+        fts_table = table("tasks_fts", column("rowid"))
+        fts = literal_column("tasks_fts")  # the table-named hidden column MATCH/bm25 operate on
+        stmt = (
+            select(dbm.Task)
+            .join(fts_table, fts_table.c.rowid == literal_column("tasks.rowid"))
+            .where(fts.op("MATCH")(_fts5_query(q)))
+            # bm25: lower is better; title weighted 2x description
+            .order_by(func.bm25(fts, 2.0, 1.0), dbm.Task.id)
+        )
+    else:
+        return like_search_statement(q, limit, offset)
+    return stmt.limit(limit + 1).offset(offset)
+
+
+def like_search_statement(q: str, limit: int, offset: int = 0) -> Select:
+    """Unindexed baseline: substring match on title/description."""
+    pattern = f"%{q}%"
+    return (
+        select(dbm.Task)
+        .where(or_(dbm.Task.title.ilike(pattern), dbm.Task.description.ilike(pattern)))
+        .order_by(dbm.Task.created_at.desc(), dbm.Task.id.desc())
+        .limit(limit + 1)
+        .offset(offset)
+    )
@@ -5,10 +5,18 @@ In FastAPI we provide a session per request using a dependency so:
     • You always get a fresh, valid session in route handlers
     • It’s closed after the request (no leaks)
     • You can later add transaction wrappers, retries, etc.
+
+Routers are `async def` and talk to the DB through `get_db`, which picks the engine from config:
+    • DB_ASYNC=true  -> a real AsyncSession on the async engine (awaited IO on the event loop)
+    • DB_ASYNC=false -> ThreadedSession: the sync Session with each blocking call run in the threadpool
+Both expose the same awaitable API, so the same handlers can be benchmarked in either mode.
 """
 
-from typing import Generator
-from app_db.database import SessionLocal
+from typing import AsyncGenerator, Generator
+from starlette.concurrency import run_in_threadpool
+from app_db.database import SessionLocal, AsyncSessionLocal
+from core.config import settings
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 
@@ -17,4 +25,72 @@ def get_session() -> Generator[Session, None, None]:
     try:
         yield db                # provide it to the endpoint
     finally:
-        db.close()              # always close
\ No newline at end of file
+        db.close()              # always close
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    # Async counterpart of get_session (requires DB_ASYNC=true)
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async engine is disabled; set DB_ASYNC=true")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+class ThreadedSession:
+    """Sync Session behind the subset of the AsyncSession API the routers use."""
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def add(self, obj) -> None:
+        self.sync_session.add(obj)
+
+    def add_all(self, objs) -> None:
+        self.sync_session.add_all(objs)
+
+    async def execute(self, statement, *args, **kwargs):
+        # Buffer rows in the worker thread, like AsyncSession.execute does
+        def _run():
+            result = self.sync_session.execute(statement, *args, **kwargs)
+            try:
+                return result.freeze()()
+            except NotImplementedError:
+                return result  # DML without RETURNING: no rows to buffer
+        return await run_in_threadpool(_run)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return (await self.execute(statement, *args, **kwargs)).scalars()
+
+    async def scalar(self, statement, *args, **kwargs):
+        return (await self.execute(statement, *args, **kwargs)).scalar()
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def delete(self, obj) -> None:
+        await run_in_threadpool(self.sync_session.delete, obj)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, obj, *args, **kwargs) -> None:
+        await run_in_threadpool(self.sync_session.refresh, obj, *args, **kwargs)
+
+
+async def get_db():
+    # Per-request DB handle for the async routers; engine chosen by settings.db_async
+    if settings.db_async:
+        async for db in get_async_session():
+            yield db
+        return
+    db = SessionLocal()
+    try:
+        yield ThreadedSession(db)
+    finally:
+        await run_in_threadpool(db.close)
@@ -0,0 +1,442 @@
+# bench.py
+"""
+Load test / benchmark for the Task API.
+
+Seeds a synthetic dataset (data_db.seed_scale), then drives each scenario with `--concurrency`
+clients for `--requests` requests and writes latency percentiles + throughput to JSON:
+
+    python bench.py --tasks 10000 --concurrency 32 --out bench-results/main.json
+    python bench.py --skip-seed --out after.json --compare bench-results/main.json
+    python bench.py --tasks 1000000 --scenarios search_tasks,search_tasks_like   # index vs LIKE scan
+    python bench.py --presign-micro 2000   # presign latency against moto, no database needed
+
+Target: the app in-process (httpx ASGITransport - no sockets, measures the app itself) by
+default, or a running server with --url http://127.0.0.1:8000 (uvicorn main:app ...).
+Seeding always goes through DATABASE_URL, so point it at a disposable database.
+
+Settings that change behaviour (DB_ASYNC, ATTACHMENT_STATS, pool sizes, ...) are read from
+the environment as usual and recorded in the output, so runs with different settings diff cleanly.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from core.config import settings
+
+# name -> request builder(client, ctx) returning a coroutine for one request
+SCENARIOS: Dict[str, Callable] = {}
+# name -> settings applied while the scenario runs (in-process target only)
+SCENARIO_SETTINGS: Dict[str, dict] = {}
+
+
+def scenario(name: str, **overrides):
+    def register(fn):
+        SCENARIOS[name] = fn
+        if overrides:
+            SCENARIO_SETTINGS[name] = overrides
+        return fn
+    return register
+
+
+@scenario("list_tasks")
+def _list_tasks(client, ctx):
+    return client.get("/todos/", params={"limit": 100})
+
+
+@scenario("list_tasks_1k")
+def _list_tasks_1k(client, ctx):
+    # Serialization-bound: compare FAST_TASK_LISTS=true/false on cpu_ms_per_request
+    return client.get("/todos/", params={"limit": 1000})
+
+
+@scenario("list_tasks_filtered")
+def _list_tasks_filtered(client, ctx):
+    return client.get("/todos/", params={"limit": 100, "tag_id": str(ctx.rng.choice(ctx.tag_ids))})
+
+
+@scenario("get_task")
+def _get_task(client, ctx):
+    return client.get(f"/todos/{ctx.rng.choice(ctx.task_ids)}")
+
+
+SEARCH_TERMS = ["login bug", "report", "deploy", "ux review"]
+
+
+@scenario("search_tasks")
+def _search_tasks(client, ctx):
+    return client.get("/todos/search", params={"q": ctx.rng.choice(SEARCH_TERMS)})
+
+
+@scenario("search_tasks_like", search_mode="like")
+def _search_tasks_like(client, ctx):
+    # Same requests as search_tasks, served by the unindexed LIKE scan: the index's baseline
+    return client.get("/todos/search", params={"q": ctx.rng.choice(SEARCH_TERMS)})
+
+
+@scenario("create_task")
+def _create_task(client, ctx):
+    return client.post("/todos/", json={
+        "title": f"bench create {ctx.rng.random():.6f}",
+        "created_by": str(ctx.rng.choice(ctx.user_ids)),
+        "assignee_ids": [str(ctx.rng.choice(ctx.user_ids))],
+        "tag_ids": [str(ctx.rng.choice(ctx.tag_ids))] if ctx.tag_ids else [],
+    })
+
+
+@scenario("bulk_create_tasks")
+def _bulk_create_tasks(client, ctx):
+    items = [{"title": f"bench bulk {i}", "created_by": str(ctx.rng.choice(ctx.user_ids))} for i in range(100)]
+    return client.post("/todos/bulk", json={"items": items})
+
+
+@scenario("patch_task")
+def _patch_task(client, ctx):
+    return client.patch(f"/todos/{ctx.rng.choice(ctx.task_ids)}", json={"priority": ctx.rng.choice(["low", "normal", "high"])})
+
+
+@scenario("presign_upload")
+def _presign_upload(client, ctx):
+    return client.post(
+        f"/attachments/tasks/{ctx.rng.choice(ctx.task_ids)}/presign-upload",
+        json={"filename": "bench.pdf", "content_type": "application/pdf", "size_bytes": 12345},
+    )
+
+
+@scenario("batch_download_urls")
+def _batch_download_urls(client, ctx):
+    return client.get(f"/attachments/tasks/{ctx.rng.choice(ctx.task_ids)}/download-urls")
+
+
+@scenario("local_download")
+async def _local_download(client, ctx):
+    # Full-file streaming throughput (see --download-mb); only when STORAGE_BACKEND=local.
+    # Streamed and discarded, so a multi-GB file never sits in the client's memory
+    async with client.stream("GET", ctx.download_url) as resp:
+        async for _ in resp.aiter_raw():
+            pass
+    return resp
+
+
+# httpx's ASGITransport buffers each response body; bigger downloads need a real server (--url)
+IN_PROCESS_DOWNLOAD_MAX_MB = 64
+
+DEFAULT_SCENARIOS = ["list_tasks", "list_tasks_filtered", "get_task", "search_tasks",
+                     "create_task", "patch_task", "presign_upload", "batch_download_urls"]
+
+
+class Context:
+    def __init__(self, user_ids, tag_ids, task_ids, seed: int):
+        self.user_ids = user_ids
+        self.tag_ids = tag_ids
+        self.task_ids = task_ids
+        self.rng = random.Random(seed)
+        self.download_url: Optional[str] = None
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def run_scenario(client, ctx, name: str, requests: int, concurrency: int, warmup: int) -> dict:
+    build = SCENARIOS[name]
+    for _ in range(warmup):  # JIT-free, but warms pools, caches and the planner
+        await build(client, ctx)
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    received = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, received
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                resp = await build(client, ctx)
+                received += resp.num_bytes_downloaded
+                if resp.status_code >= 400:
+                    errors[str(resp.status_code)] = errors.get(str(resp.status_code), 0) + 1
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    started, cpu_started = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+
+    ms = sorted(1000 * x for x in latencies)
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "rps": round(len(ms) / wall, 1) if wall else 0.0,
+        "mb_per_second": round(received / wall / 1e6, 1) if wall else 0.0,
+        # Whole-process CPU (all threads); only the app's own cost when the target is in-process
+        "cpu_ms_per_request": round(1000 * cpu / len(ms), 3) if ms else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ms), 3) if ms else 0.0,
+            "p50": round(percentile(ms, 50), 3),
+            "p95": round(percentile(ms, 95), 3),
+            "p99": round(percentile(ms, 99), 3),
+            "max": round(ms[-1], 3) if ms else 0.0,
+        },
+    }
+
+
+def load_ids(limit: int = 50000):
+    from app_db.database import SessionLocal
+    from app_db import models as dbm
+    with SessionLocal() as db:
+        return (
+            [u for (u,) in db.query(dbm.User.id).limit(limit)],
+            [t for (t,) in db.query(dbm.Tag.id).limit(limit)],
+            [t for (t,) in db.query(dbm.Task.id).limit(limit)],
+        )
+
+
+def seed_download_file(task_id, size_mb: int):
+    """
+    Write one size_mb file straight into LocalStorage plus its attachment row; returns the id.
+    Not through upload-direct: that caps uploads at MAX_UPLOAD_BYTES, and the request body
+    would be built in memory. The file is written 1 MiB at a time, so any size works.
+    """
+    from app_db import models as dbm
+    from app_db.database import SessionLocal
+    from services.storage import get_storage
+
+    storage = get_storage()
+    key = f"{settings.aws_s3_prefix}{task_id}/{uuid.uuid4().hex}.bin"
+    path = storage.shard_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    chunk = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(chunk)
+    with SessionLocal() as db:
+        att = dbm.Attachment(task_id=task_id, filename="bench.bin", content_type="application/octet-stream",
+                             size_bytes=size_mb * 1024 * 1024, storage_key=key,
+                             uploaded_at=datetime.now(timezone.utc))
+        db.add(att)
+        db.commit()
+        return att.id
+
+
+async def prepare_download(client, ctx, size_mb: int) -> None:
+    """Seed one size_mb file (see seed_download_file) and remember its download URL."""
+    if settings.storage_backend != "local":
+        sys.exit("[bench] local_download needs STORAGE_BACKEND=local")
+    attachment_id = seed_download_file(ctx.task_ids[0], size_mb)
+    url = await client.get(f"/attachments/{attachment_id}/download-url")
+    url.raise_for_status()
+    ctx.download_url = url.json()["url"]
+
+
+def presign_micro(iterations: int) -> dict:
+    """
+    Presign latency against moto (signing is local, so no network either way): a new
+    S3Storage per call - what get_storage did before the registry - vs the shared client,
+    and presigned_download with a cold vs a warm URL cache.
+    """
+    from moto import mock_aws
+    from services.cache import presign_cache
+    from services.storage import get_storage, presigned_download, reset_storage
+    from services.storage.s3 import S3Storage
+
+    expires = settings.presigned_expires_seconds
+    keys = [f"{settings.aws_s3_prefix}bench/{i}.bin" for i in range(iterations)]
+
+    def timed(fn, keys) -> dict:
+        us = []
+        for key in keys:
+            start = time.perf_counter()
+            fn(key)
+            us.append(1e6 * (time.perf_counter() - start))
+        us.sort()
+        return {"calls": len(us), "mean_us": round(statistics.fmean(us), 1),
+                "p50_us": round(percentile(us, 50), 1), "p99_us": round(percentile(us, 99), 1)}
+
+    saved_backend = settings.storage_backend
+    settings.storage_backend = "s3"
+    reset_storage()
+    try:
+        with mock_aws():
+            shared = get_storage()
+            results = {
+                # Client construction dominates: a tenth of the calls is plenty
+                "new_client_per_call": timed(lambda k: S3Storage().presign_download(k, expires),
+                                             keys[:max(1, iterations // 10)]),
+                "shared_client": timed(lambda k: shared.presign_download(k, expires), keys),
+            }
+            presign_cache.clear()
+            results["presigned_download_uncached"] = timed(presigned_download, keys)  # first sight of each key
+            results["presigned_download_cached"] = timed(presigned_download, keys)    # same keys again
+    finally:
+        settings.storage_backend = saved_backend
+        reset_storage()
+        presign_cache.clear()
+    for name, r in results.items():
+        print(f"[bench] presign {name:28} {r['calls']:6} calls  mean {r['mean_us']:9.1f} us  "
+              f"p50 {r['p50_us']:9.1f} us  p99 {r['p99_us']:9.1f} us")
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\n{'scenario':24} {'rps':>18} {'p50 ms':>20} {'p99 ms':>20} {'cpu ms/req':>20}")
+    for name, cur in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        def delta(a, b):
+            return f"{b:9.1f} -> {a:<9.1f}" if not b else f"{a:8.1f} ({100 * (a - b) / b:+5.1f}%)"
+        print(f"{name:24} {delta(cur['rps'], old['rps']):>18} "
+              f"{delta(cur['latency_ms']['p50'], old['latency_ms']['p50']):>20} "
+              f"{delta(cur['latency_ms']['p99'], old['latency_ms']['p99']):>20} "
+              f"{delta(cur.get('cpu_ms_per_request', 0), old.get('cpu_ms_per_request', 0)):>20}")
+
+
+async def main_async(args) -> dict:
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        target = args.url
+    else:
+        import main as app_module
+        transport = httpx.ASGITransport(app=app_module.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+        target = "in-process"
+
+    if not args.skip_seed:
+        from data_db import seed_scale
+        started = time.perf_counter()
+        seed_scale(args.users, args.tags, args.tasks, seed=args.seed)
+        print(f"[bench] seeded {args.users} users / {args.tags} tags / {args.tasks} tasks "
+              f"in {time.perf_counter() - started:.1f}s")
+    ctx = Context(*load_ids(), seed=args.seed)
+    if not ctx.task_ids:
+        sys.exit("[bench] no tasks in the database - run without --skip-seed")
+
+    scenarios = args.scenarios.split(",") if args.scenarios else list(DEFAULT_SCENARIOS)
+    if args.download_mb:
+        scenarios.append("local_download")
+    if "local_download" in scenarios and not args.url and (args.download_mb or 64) > IN_PROCESS_DOWNLOAD_MAX_MB:
+        sys.exit(f"[bench] in-process downloads are buffered in memory; above {IN_PROCESS_DOWNLOAD_MAX_MB} MB "
+                 f"run the app under uvicorn and pass --url")
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        sys.exit(f"[bench] unknown scenarios: {', '.join(unknown)} (have: {', '.join(SCENARIOS)})")
+    overridden = [s for s in scenarios if s in SCENARIO_SETTINGS]
+    if args.url and overridden:
+        sys.exit(f"[bench] {', '.join(overridden)} change settings in-process; against a server, restart it "
+                 f"with {SCENARIO_SETTINGS[overridden[0]]} and run the base scenario instead")
+
+    results = {}
+    async with client:
+        if "local_download" in scenarios:
+            await prepare_download(client, ctx, args.download_mb or 64)
+        for name in scenarios:
+            requests = args.download_requests if name == "local_download" else args.requests
+            overrides = SCENARIO_SETTINGS.get(name, {})
+            saved = {key: getattr(settings, key) for key in overrides}
+            for key, value in overrides.items():
+                setattr(settings, key, value)
+            try:
+                results[name] = await run_scenario(client, ctx, name, requests, args.concurrency, args.warmup)
+            finally:
+                for key, value in saved.items():
+                    setattr(settings, key, value)
+            r = results[name]
+            if overrides:
+                r["settings"] = overrides
+            print(f"[bench] {name:22} {r['rps']:9.1f} rps  p50 {r['latency_ms']['p50']:8.2f} ms  "
+                  f"p95 {r['latency_ms']['p95']:8.2f} ms  p99 {r['latency_ms']['p99']:8.2f} ms  "
+                  f"cpu {r['cpu_ms_per_request']:7.2f} ms/req  errors {sum(r['errors'].values())}")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "target": target,
+            "python": platform.python_version(),
+            "database": settings.database_url.split("://", 1)[0],
+            "settings": {
+                "db_async": settings.db_async,
+                "db_pool_size": settings.db_pool_size,
+                "db_max_overflow": settings.db_max_overflow,
+                "attachment_stats": settings.attachment_stats,
+                "fast_task_lists": settings.fast_task_lists,
+                "storage_backend": settings.storage_backend,
+                "search_mode": settings.search_mode,
+            },
+            "scale": {"users": len(ctx.user_ids), "tags": len(ctx.tag_ids), "tasks_sampled": len(ctx.task_ids)},
+            "concurrency": args.concurrency,
+            "requests_per_scenario": args.requests,
+        },
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Task API load test; writes JSON results.")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed (dataset and request mix)")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--scenarios", help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests before each scenario")
+    parser.add_argument("--download-mb", type=int, default=0,
+                        help="add local_download with a file of this size (local backend); above "
+                             f"{IN_PROCESS_DOWNLOAD_MAX_MB} MB it needs --url")
+    parser.add_argument("--download-requests", type=int, default=20)
+    parser.add_argument("--out", default=f"bench-results/{datetime.now():%Y%m%d-%H%M%S}.json")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    parser.add_argument("--presign-micro", type=int, metavar="N", default=0,
+                        help="only run the presign micro-benchmark (N keys, against moto) and exit")
+    args = parser.parse_args()
+
+    if args.presign_micro:
+        result = {
+            "meta": {"timestamp": datetime.now(timezone.utc).isoformat(), "git_commit": git_commit(),
+                     "python": platform.python_version(), "presign_cache_max_entries": settings.presign_cache_max_entries},
+            "presign_micro": presign_micro(args.presign_micro),
+        }
+    else:
+        result = asyncio.run(main_async(args))
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"[bench] results written to {args.out}")
+    if args.compare and "scenarios" in result:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# core/conditional.py
+"""
+HTTP conditional request helpers (RFC 9110 §13).
+
+Task representations only change when `Task.updated_at` changes (every write path bumps it),
+so the ETag is derived from (id, updated_at) instead of hashing the serialized body:
+    • GET with If-None-Match / If-Modified-Since -> 304, no serialization, empty body
+    • PATCH with If-Match -> 412 if someone else changed the task first (optimistic concurrency)
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def _utc(dt: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they are stored as UTC
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def http_date(dt: datetime) -> str:
+    return format_datetime(_utc(dt), usegmt=True)
+
+
+def _tags(header: str) -> Iterable[str]:
+    return (t.strip() for t in header.split(",") if t.strip())
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def none_match(request: Request, etag: str) -> bool:
+    """True if If-None-Match matches (weak comparison) -> respond 304."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return any(t == "*" or _opaque(t) == _opaque(etag) for t in _tags(header))
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    # If-None-Match wins; If-Modified-Since is only consulted when it is absent
+    if request.headers.get("if-none-match"):
+        return none_match(request, etag)
+    since = request.headers.get("if-modified-since")
+    if not since or last_modified is None:
+        return False
+    try:
+        since_dt = parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
+    if since_dt.tzinfo is None:
+        since_dt = since_dt.replace(tzinfo=timezone.utc)
+    # HTTP dates have second precision
+    return _utc(last_modified).replace(microsecond=0) <= since_dt
+
+
+def if_match_fails(request: Request, etag: str) -> bool:
+    """True if an If-Match header is present and does not match (strong comparison) -> 412."""
+    header = request.headers.get("if-match")
+    if not header:
+        return False
+    return not any(t == "*" or (not t.startswith("W/") and t == etag) for t in _tags(header))
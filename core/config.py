@@ -1,4 +1,5 @@
 import os
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,6 +12,28 @@ class Settings(BaseSettings):
     # --- Database ---
     database_url: str = "sqlite:////tmp/taskapi.db"  # Lambda writable dir
     #database_url: str  # maps from DATABASE_URL in .env
+    db_async: bool = False  # DB_ASYNC=true -> routers run on the async engine (see app_db.session.get_db)
+
+    # --- DB connection pool (per process) ---
+    # Budget: replicas (HPA max) * (db_pool_size + db_max_overflow) must stay below Postgres max_connections
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30      # seconds to wait for a free connection before erroring
+    db_pool_recycle: int = 1800    # seconds; -1 disables. Keep below server/LB idle timeouts
+    db_pool_pre_ping: bool = True  # False -> skip the per-checkout round trip and rely on db_pool_recycle
+
+    # --- In-process lookup cache (users/tags; see services/cache.py) ---
+    lookup_cache_ttl_seconds: int = 60
+    lookup_cache_max_entries: int = 10000
+    # TaskRead.attachment_count / attachment_bytes: 'aggregate' (one grouped query per page),
+    # 'counter' (denormalized tasks columns), or 'off' (fields stay null)
+    attachment_stats: Literal["aggregate", "counter", "off"] = "aggregate"
+    # GET /todos/ and /todos/search: build rows from SQL tuples and encode with orjson, skipping
+    # the response_model re-validation (core/responses.py). False -> TaskRead models as before
+    fast_task_lists: bool = True
+    # GET /todos/search: 'index' (tsvector / FTS5) or 'like' (unindexed substring scan, the
+    # baseline bench.py's search_tasks_like scenario measures against)
+    search_mode: Literal["index", "like"] = "index"
 
     # --- Storage configuration ---
     storage_backend: str = "local"  # 'local' or 's3'
@@ -18,7 +41,40 @@ class Settings(BaseSettings):
     aws_s3_bucket: str = "taskapi-medhini-dev"
     aws_s3_prefix: str = "attachments/"
     local_storage_dir: str = "./uploaded_files"
+    max_upload_bytes: int = 100 * 1024 * 1024  # upload-direct hard limit, enforced while streaming
+    upload_chunk_bytes: int = 1024 * 1024      # read/write/hash granularity for upload-direct
     presigned_expires_seconds: int = 900
+    # Presigned download URLs are reused until this many seconds before they expire
+    presign_cache_margin_seconds: int = 60
+    presign_cache_max_entries: int = 10000
+    # S3 client (one per process, shared by all requests; see services/storage)
+    s3_max_pool_connections: int = 50   # botocore HTTP pool; >= threadpool size so workers never queue
+    s3_connect_timeout: int = 5
+    s3_read_timeout: int = 30
+    s3_max_attempts: int = 3
+    # Multipart uploads (S3 limits: parts >= 5 MiB except the last, <= 10,000 parts)
+    s3_multipart_part_bytes: int = 16 * 1024 * 1024
+    s3_multipart_stale_seconds: int = 24 * 3600  # abort-stale removes uploads older than this
+    # Image previews (services/thumbnails.py); needs Pillow
+    thumbnails_enabled: bool = True
+    thumbnail_max_px: int = 320                 # longest side of the preview
+    thumbnail_workers: int = 2                  # processes in the resize pool
+    thumbnail_max_source_bytes: int = 25 * 1024 * 1024  # larger images get no preview
+    # Storage deletion outbox (services/outbox.py): drained in the background, never on the request path
+    storage_deletion_worker: bool = True       # run the drain loop in this process
+    storage_deletion_batch_size: int = 1000    # S3 DeleteObjects takes at most 1000 keys
+    storage_deletion_poll_seconds: float = 5.0
+    storage_deletion_retry_seconds: int = 30   # first retry delay, doubled per attempt (capped at 1h)
+    storage_deletion_max_attempts: int = 10    # rows past this stay in the table for inspection
+
+    # --- Request profiling (core/profiling.py); reports listed at GET /admin/profiles ---
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.0   # fraction of requests profiled without an X-Profile header
+    profiling_token: str = ""            # X-Profile / X-Profile-Token value; unset -> sampling only, admin closed
+    profiling_dir: str = "./profiles"
+    profiling_interval_ms: float = 2.0   # stack sampling period
+    profiling_max_reports: int = 200     # older reports are pruned
+    admin_token: str = ""                # X-Admin-Token for maintenance endpoints; unset -> they are closed
 
     # --- App / environment ---
     environment: str = "dev"
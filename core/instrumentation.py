@@ -0,0 +1,244 @@
+# core/instrumentation.py
+"""
+Request and DB instrumentation, exposed in Prometheus text format at GET /metrics.
+
+    • MetricsMiddleware (pure ASGI, added in main.py) times every request and counts it by
+      (method, route template, status) - the template (`/todos/{task_id}`), never the raw path,
+      so label cardinality stays bounded.
+    • `instrument_engine()` hooks before/after_cursor_execute on an engine: every statement is
+      timed and charged to the request that issued it via a contextvar. The per-request
+      statement count histogram is what exposes an N+1: a route whose count grows with the
+      page size instead of staying flat.
+
+Metrics are per process (like /metrics/db-pool): scrape every replica.
+No client library needed - the few primitives below are enough for counters, a gauge and
+histograms, and render the exposition format directly.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def render(self) -> List[str]:
+        return self._header() + [f"{self.name} {self._value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, labels: Tuple = ()) -> None:
+        i = bisect.bisect_left(self.buckets, value)  # first bucket with upper bound >= value
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self._header()
+        for labels, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, labels, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labels, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labels, labels)} {series[-1]}")
+        return lines
+
+
+# ---------- The metrics ----------
+
+ROUTE_LABELS = ("method", "route")
+
+http_requests = Counter("http_requests_total", "Requests handled.", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "Request latency, first byte in to last byte out.", ROUTE_LABELS)
+http_in_flight = Gauge("http_requests_in_flight", "Requests currently being handled.")
+request_statements = Histogram(
+    "db_statements_per_request", "SQL statements executed per request.", ROUTE_LABELS, STATEMENT_COUNT_BUCKETS,
+)
+request_db_time = Histogram("db_time_per_request_seconds", "Time spent in SQL per request.", ROUTE_LABELS)
+statement_latency = Histogram("db_statement_duration_seconds", "Latency of single SQL statements.", (), SQL_LATENCY_BUCKETS)
+statements_outside_requests = Counter("db_statements_outside_requests_total", "SQL statements not issued by a request (workers, startup).")
+
+REGISTRY = [http_requests, http_latency, http_in_flight, request_statements, request_db_time,
+            statement_latency, statements_outside_requests]
+
+
+def render_metrics(extra: Iterable[str] = ()) -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    lines += extra
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Per-request SQL accounting ----------
+
+class _RequestDB:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# The middleware sets a fresh _RequestDB per request; threadpool workers (ThreadedSession) and
+# the async engine's greenlets run with a copy of the request context, so they see the same object.
+_current: ContextVar[Optional[_RequestDB]] = ContextVar("request_db", default=None)
+_instrumented = set()
+
+
+def current_request_db() -> Optional[_RequestDB]:
+    """SQL count/time so far for the request being handled (None outside MetricsMiddleware)."""
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # The start time lives on the statement's execution context: a statement that raises never
+    # reaches after_cursor_execute, and nothing of it may pile up on the pooled connection.
+    # Dialect-internal executions (sequences, defaults) can come without a context; they get
+    # one overwritten slot on the connection instead.
+    start = time.perf_counter()
+    if context is not None:
+        context._query_start = start
+    else:
+        conn.info["query_start"] = start
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = context._query_start if context is not None else conn.info.pop("query_start")
+    elapsed = time.perf_counter() - start
+    statement_latency.observe(elapsed)
+    stats = _current.get()
+    if stats is None:
+        statements_outside_requests.inc()
+        return
+    stats.statements += 1
+    stats.seconds += elapsed
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement on `engine` (pass `async_engine.sync_engine` for the async one)."""
+    if id(engine) in _instrumented:
+        return
+    _instrumented.add(id(engine))
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------- HTTP middleware ----------
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"  # 404s must not add one series per URL
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500  # if the app raises before starting a response
+        db_stats = _RequestDB()
+        token = _current.set(db_stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            _current.reset(token)
+            labels = (scope["method"], _route_template(scope))
+            http_requests.inc(labels + (str(status_code),))
+            http_latency.observe(elapsed, labels)
+            request_statements.observe(db_stats.statements, labels)
+            request_db_time.observe(db_stats.seconds, labels)
@@ -0,0 +1,300 @@
+# core/profiling.py
+"""
+Opt-in per-request profiling (PROFILING_ENABLED=true), for finding where a slow endpoint spends
+its time in a real deployment.
+
+A request is profiled when it carries `X-Profile: <PROFILING_TOKEN>`, or at random with
+probability PROFILING_SAMPLE_RATE. Without a token only sampling works and the admin routes stay
+closed. One request is profiled at a time per process; others pass through untouched.
+
+While it runs, a sampler thread records the stacks of every busy thread every
+PROFILING_INTERVAL_MS (idle loop/threadpool waits are dropped). That covers the event loop and
+the threadpool workers a request hands sync work to (ThreadedSession, sync endpoints), at the
+price of also catching whatever else the process is doing - profile on a quiet replica for a
+clean picture. Alongside the samples the report records phase timings (ms):
+
+    validation  middleware entry -> endpoint start: routing, body parsing, params, dependencies
+    endpoint    the endpoint function, which includes
+      db          SQL time charged to the request (core/instrumentation.py)
+      serialize   ORM -> TaskRead (to_task_reads*)
+    render      endpoint return -> response start: response_model validation + JSON encoding
+    send        response start -> last body byte
+
+Reports land in PROFILING_DIR as {id}.json plus {id}.folded (collapsed stacks: feed to
+flamegraph.pl, inferno or speedscope for a flamegraph) and are listed at GET /admin/profiles.
+Endpoint phases need the router's route class to be ProfiledRoute.
+"""
+
+import asyncio
+import functools
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from core.instrumentation import current_request_db
+
+HEADER = b"x-profile"
+# Leaf frames in these files are threads waiting for work, not doing it
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py", "thread.py")
+_MAX_DEPTH = 128
+
+# Only one profiled request per process: keeps overhead bounded and attribution readable
+_busy = threading.Lock()
+
+
+class _Report:
+    __slots__ = ("id", "marks", "phases")
+
+    def __init__(self):
+        self.id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+        self.marks: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}  # seconds, accumulated by phase()
+
+
+_active: ContextVar[Optional[_Report]] = ContextVar("profile_report", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """Charge the enclosed block to `name` in the current request's report (no-op otherwise)."""
+    report = _active.get()
+    if report is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.phases[name] = report.phases.get(name, 0.0) + time.perf_counter() - start
+
+
+# ---------- Endpoint boundaries ----------
+
+def _mark(name: str) -> None:
+    report = _active.get()
+    if report is not None:
+        report.marks[name] = time.perf_counter()
+
+
+def _timed_endpoint(endpoint):
+    # functools.wraps keeps the signature FastAPI reads params and response_model from
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            _mark("endpoint_start")
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark("endpoint_end")
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):  # runs in the threadpool, with the request's context
+            _mark("endpoint_start")
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _mark("endpoint_end")
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute that marks where the endpoint starts/ends, for the validation/render split."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+# ---------- Stack sampler ----------
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="profiler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._done = threading.Event()  # not _stop: Thread uses that name internally
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._done.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == me or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < _MAX_DEPTH:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+# ---------- Reports on disk ----------
+
+def _write_report(meta: dict, stacks: Counter) -> None:
+    os.makedirs(settings.profiling_dir, exist_ok=True)
+    base = os.path.join(settings.profiling_dir, meta["id"])
+    with open(base + ".folded", "w") as f:
+        f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    with open(base + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    _prune()
+
+
+def _prune() -> None:
+    reports = sorted(n for n in os.listdir(settings.profiling_dir) if n.endswith(".json"))
+    for name in reports[:-settings.profiling_max_reports or None]:
+        for ext in (".json", ".folded"):
+            try:
+                os.remove(os.path.join(settings.profiling_dir, name[:-5] + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_reports(limit: int) -> List[dict]:
+    """Newest first; report ids start with their UTC timestamp, so names sort by age."""
+    if not os.path.isdir(settings.profiling_dir):
+        return []
+    names = sorted((n for n in os.listdir(settings.profiling_dir) if n.endswith(".json")), reverse=True)
+    reports = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(settings.profiling_dir, name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue  # being written or pruned right now
+        meta.pop("top_functions", None)
+        reports.append(meta)
+    return reports
+
+
+def report_path(report_id: str, ext: str) -> Optional[str]:
+    path = os.path.join(settings.profiling_dir, report_id + ext)
+    return path if os.path.isfile(path) else None
+
+
+def _top_functions(stacks: Counter, n: int = 25) -> List[dict]:
+    # Self samples per leaf frame: the flat "where does the CPU go" view without a flamegraph tool
+    leaves: Counter = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    total = sum(leaves.values()) or 1
+    return [{"function": f, "samples": c, "percent": round(100 * c / total, 1)} for f, c in leaves.most_common(n)]
+
+
+# ---------- Middleware ----------
+
+def _requested(scope) -> Optional[str]:
+    # On demand only with the token: without one, any client could force profiling (and disk writes)
+    token = settings.profiling_token.encode("latin-1")
+    if token:
+        for name, value in scope.get("headers", ()):
+            if name == HEADER and hmac.compare_digest(value.strip(), token):
+                return "header"
+    if settings.profiling_sample_rate > 0 and random.random() < settings.profiling_sample_rate:
+        return "sampled"
+    return None
+
+
+def _ms(seconds: float) -> float:
+    return round(1000 * seconds, 3)
+
+
+class ProfilingMiddleware:
+    """Add inside MetricsMiddleware (i.e. before it in main.py) so the DB stats are visible."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.profiling_enabled:
+            return await self.app(scope, receive, send)
+        trigger = _requested(scope)
+        if trigger is None or not _busy.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        report = _Report()
+        token = _active.set(report)
+        status_code = 500
+        sampler = _Sampler(settings.profiling_interval_ms / 1000)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                report.marks["response_start"] = time.perf_counter()
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"x-profile-id", report.id.encode())]}
+            await send(message)
+
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end = time.perf_counter()
+            sampler.stop()
+            _active.reset(token)
+            _busy.release()
+            meta = self._meta(scope, report, trigger, status_code, start, end, sampler)
+            await run_in_threadpool(_write_report, meta, sampler.stacks)
+
+    @staticmethod
+    def _meta(scope, report: _Report, trigger: str, status_code: int, start: float, end: float, sampler: _Sampler) -> dict:
+        marks = report.marks
+        phases: Dict[str, float] = {}
+        if "endpoint_start" in marks:
+            phases["validation"] = _ms(marks["endpoint_start"] - start)
+            if "endpoint_end" in marks:
+                phases["endpoint"] = _ms(marks["endpoint_end"] - marks["endpoint_start"])
+                if "response_start" in marks:
+                    phases["render"] = _ms(marks["response_start"] - marks["endpoint_end"])
+        if "response_start" in marks:
+            phases["send"] = _ms(end - marks["response_start"])
+        db = current_request_db()
+        if db is not None:
+            phases["db"] = _ms(db.seconds)
+        phases.update({name: _ms(seconds) for name, seconds in report.phases.items()})
+        route = scope.get("route")
+        return {
+            "id": report.id,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "route": getattr(route, "path", None),
+            "status": status_code,
+            "trigger": trigger,
+            "duration_ms": _ms(end - start),
+            "phases_ms": phases,
+            "db_statements": db.statements if db is not None else None,
+            "samples": sampler.samples,
+            "interval_ms": settings.profiling_interval_ms,
+            "top_functions": _top_functions(sampler.stacks),
+        }
@@ -1,4 +1,11 @@
 # data_db.py
+import argparse
+import itertools
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 from app_db.database import SessionLocal
 from app_db import models as dbm
@@ -53,26 +60,31 @@ def get_or_create(session, model, defaults=None, **kwargs):
     session.flush()  # assign PK/UUID
     return obj, True
 
+def ensure_org(session):
+    """Departments and roles from DEPARTMENTS/ROLES; returns (dept_map, role_map)."""
+    # Departments
+    dept_map = {}
+    for name in DEPARTMENTS:
+        d, _ = get_or_create(session, dbm.Department, name=name)
+        dept_map[name] = d
+
+    # Roles
+    role_map = {}
+    for dept_name, role_names in ROLES.items():
+        for rname in role_names:
+            r, _ = get_or_create(
+                session, dbm.Role,
+                name=rname,
+                department_id=dept_map[dept_name].id,
+            )
+            role_map[(dept_name, rname)] = r
+    return dept_map, role_map
+
 def main():
     """Seed a compact dataset and wire FKs/M2M for quick E2E tests."""
     db = SessionLocal()
     try:
-        # Departments
-        dept_map = {}
-        for name in DEPARTMENTS:
-            d, _ = get_or_create(db, dbm.Department, name=name)
-            dept_map[name] = d
-
-        # Roles
-        role_map = {}
-        for dept_name, role_names in ROLES.items():
-            for rname in role_names:
-                r, _ = get_or_create(
-                    db, dbm.Role,
-                    name=rname,
-                    department_id=dept_map[dept_name].id,
-                )
-                role_map[(dept_name, rname)] = r
+        dept_map, role_map = ensure_org(db)
 
         # Users (first pass)
         user_map = {}
@@ -141,5 +153,201 @@ def main():
     finally:
         db.close()
 
+# ---- scale generator (capacity / load tests) ----
+# Rows are built as plain tuples and written with Core executemany, or COPY on Postgres -
+# no ORM objects, no per-row flush. Content (titles, statuses, who owns/is tagged on what,
+# attachment sizes) comes from an RNG seeded by --seed, and tasks are generated in fixed
+# SEED_CHUNK_TASKS chunks each with its own RNG, so the same --seed gives the same dataset
+# whatever --workers is. IDs come from a second RNG that also mixes in a per-run token, so
+# repeated runs add new rows instead of colliding with the previous ones.
+# Counts follow a Zipf-like skew: a few users/tags get most tasks.
+
+TITLE_VERBS = ["Fix", "Build", "Review", "Refactor", "Deploy", "Investigate", "Document", "Test", "Design", "Migrate"]
+TITLE_NOUNS = ["login bug", "report export", "billing page", "search", "onboarding flow", "API rate limits",
+               "deploy pipeline", "ux review", "churn model", "audit log", "notifications", "permissions"]
+DESCRIPTIONS = ["Customer reported it twice this week.", "Blocked on the platform team.",
+                "Needs a design pass first.", "Follow-up from the retro.", "Part of the Q4 roadmap.", None]
+STATUS_WEIGHTS = {"todo": 30, "in_progress": 20, "blocked": 5, "done": 40, "cancelled": 5}
+PRIORITY_WEIGHTS = {"low": 20, "normal": 50, "high": 25, "urgent": 5}
+FILE_TYPES = [("pdf", "application/pdf"), ("png", "image/png"), ("jpg", "image/jpeg"),
+              ("csv", "text/csv"), ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")]
+
+SEED_CHUNK_TASKS = 10000
+
+USER_COLUMNS = ("id", "first_name", "last_name", "email", "department_id", "role_id", "reports_to")
+TAG_COLUMNS = ("id", "name")
+TASK_COLUMNS = ("id", "title", "description", "status", "priority", "created_at", "updated_at", "due_at",
+                "completed_at", "created_by", "attachment_count", "attachment_bytes")
+ASSIGNEE_COLUMNS = ("task_id", "user_id", "assigned_at")
+TASK_TAG_COLUMNS = ("task_id", "tag_id")
+ATTACHMENT_COLUMNS = ("id", "task_id", "uploader_id", "filename", "content_type", "size_bytes",
+                      "storage_key", "uploaded_at", "created_at")
+
+def _rand_uuid(rng) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+def _skewed(n: int, skew: float) -> list:
+    """Cumulative weights for rng.choices: rank r gets 1/(r+1)**skew (0 = uniform)."""
+    return list(itertools.accumulate(1.0 / (r + 1) ** skew for r in range(n)))
+
+def _write_rows(conn, table, columns, rows, use_copy: bool) -> None:
+    if not rows:
+        return
+    if use_copy:
+        # psycopg 3 COPY ... FROM STDIN on the connection's own transaction
+        with conn.connection.dbapi_connection.cursor() as cur:
+            with cur.copy(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+    else:
+        conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+def _task_rows(rng, id_rng, start: int, stop: int, user_ids, user_weights, tag_ids, tag_weights,
+               attachments: float, now: datetime):
+    """Rows for tasks [start, stop) and everything hanging off them."""
+    statuses, status_w = list(STATUS_WEIGHTS), list(itertools.accumulate(STATUS_WEIGHTS.values()))
+    priorities, priority_w = list(PRIORITY_WEIGHTS), list(itertools.accumulate(PRIORITY_WEIGHTS.values()))
+    more_attachments = attachments / (1 + attachments)  # geometric count with this mean
+    tasks, assignees, task_tags, files = [], [], [], []
+    for i in range(start, stop):
+        task_id = _rand_uuid(id_rng)
+        created_at = now - timedelta(seconds=rng.random() * 365 * 86400)
+        status = rng.choices(statuses, cum_weights=status_w)[0]
+        owners = dict.fromkeys(rng.choices(user_ids, cum_weights=user_weights, k=rng.randint(1, 3)))
+        for user_id in owners:
+            assignees.append((task_id, user_id, created_at))
+        if tag_ids:
+            for tag_id in dict.fromkeys(rng.choices(tag_ids, cum_weights=tag_weights, k=rng.randint(0, 3))):
+                task_tags.append((task_id, tag_id))
+
+        count = size_total = 0
+        while rng.random() < more_attachments:
+            ext, content_type = rng.choice(FILE_TYPES)
+            size = int(rng.lognormvariate(11, 1.5))  # median ~60 KB, long tail
+            files.append((_rand_uuid(id_rng), task_id, next(iter(owners)), f"file-{i}-{count}.{ext}", content_type,
+                          size, f"attachments/{task_id}/{id_rng.getrandbits(64):016x}.{ext}", created_at, created_at))
+            count += 1
+            size_total += size
+
+        tasks.append((
+            task_id,
+            f"{rng.choice(TITLE_VERBS)} {rng.choice(TITLE_NOUNS)} #{i}",
+            rng.choice(DESCRIPTIONS),
+            status,
+            rng.choices(priorities, cum_weights=priority_w)[0],
+            created_at,
+            created_at,
+            created_at + timedelta(days=rng.randint(1, 60)),
+            created_at + timedelta(hours=rng.randint(1, 24 * 30)) if status == "done" else None,
+            rng.choices(user_ids, cum_weights=user_weights)[0],
+            count,
+            size_total,
+        ))
+    return tasks, assignees, task_tags, files
+
+def _worker_init() -> None:
+    from app_db.database import engine
+    engine.dispose(close=False)  # forked worker: never reuse the parent's pooled connections
+
+def _seed_task_range(job) -> int:
+    """Write tasks [start, stop) in batches; runs in the caller or in a pool process."""
+    start, stop, seed, run, user_ids, tag_ids, attachments, skew, batch, use_copy, now = job
+    from app_db.database import engine
+    rng, id_rng = random.Random(f"{seed}:{start}"), random.Random(f"{seed}:{run}:{start}")
+    user_weights, tag_weights = _skewed(len(user_ids), skew), _skewed(len(tag_ids), skew)
+    written = 0
+    for lo in range(start, stop, batch):
+        tasks, assignees, task_tags, files = _task_rows(
+            rng, id_rng, lo, min(lo + batch, stop), user_ids, user_weights, tag_ids, tag_weights, attachments, now,
+        )
+        with engine.begin() as conn:
+            _write_rows(conn, dbm.Task.__table__, TASK_COLUMNS, tasks, use_copy)
+            _write_rows(conn, dbm.TaskAssignee.__table__, ASSIGNEE_COLUMNS, assignees, use_copy)
+            _write_rows(conn, dbm.TaskTag.__table__, TASK_TAG_COLUMNS, task_tags, use_copy)
+            _write_rows(conn, dbm.Attachment.__table__, ATTACHMENT_COLUMNS, files, use_copy)
+        written += len(tasks)
+    return written
+
+def seed_scale(n_users: int, n_tags: int, n_tasks: int, attachments: float = 0.5, skew: float = 1.0,
+               seed: int = 42, batch: int = 10000, workers: int = 1, copy: bool = True) -> dict:
+    """
+    Add a synthetic dataset on top of whatever is there (capacity tests, bench.py):
+    n_users users reporting to a few managers, n_tags tags, n_tasks tasks spread over the last
+    year with 1-3 assignees, 0-3 tags and on average `attachments` attachments each (metadata
+    only - no objects are written to storage). Task attachment counters are filled in directly.
+    copy=True uses COPY on Postgres; workers > 1 splits the tasks over processes (Postgres only).
+    Returns the row counts written.
+    """
+    from app_db.database import engine
+    use_copy = copy and engine.dialect.name == "postgresql"
+    if engine.dialect.name != "postgresql":
+        workers = 1  # SQLite allows one writer at a time
+    run = uuid.uuid4().hex[:12]  # keeps IDs, emails and tag names unique across runs
+    rng, id_rng = random.Random(seed), random.Random(f"{seed}:{run}")
+    now = datetime.now(timezone.utc)
+
+    db = SessionLocal()
+    try:
+        roles = [(r.department_id, r.id) for r in ensure_org(db)[1].values()]
+        existing_users = [u for (u,) in db.query(dbm.User.id)] if not n_users else []
+        db.commit()
+    finally:
+        db.close()
+
+    users, user_ids = [], []
+    managers = max(1, n_users // 20)
+    for i in range(n_users):
+        department_id, role_id = rng.choice(roles)
+        user_id = _rand_uuid(id_rng)
+        reports_to = user_ids[rng.randrange(min(i, managers))] if i else None
+        users.append((user_id, f"Bench{i}", "User", f"bench{i}.{run}@example.com",
+                      department_id, role_id, reports_to))
+        user_ids.append(user_id)
+    tags = [(_rand_uuid(id_rng), f"bench-{run}-{i}") for i in range(n_tags)]
+    with engine.begin() as conn:
+        for lo in range(0, len(users), batch):
+            _write_rows(conn, dbm.User.__table__, USER_COLUMNS, users[lo:lo + batch], use_copy)
+        _write_rows(conn, dbm.Tag.__table__, TAG_COLUMNS, tags, use_copy)
+    user_ids = user_ids or existing_users
+    if not user_ids:
+        raise ValueError("no users to own the tasks: pass n_users > 0")
+    tag_ids = [t[0] for t in tags]
+
+    jobs = [(lo, min(lo + SEED_CHUNK_TASKS, n_tasks), seed, run, user_ids, tag_ids, attachments, skew, batch, use_copy, now)
+            for lo in range(0, n_tasks, SEED_CHUNK_TASKS)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+            written = sum(pool.map(_seed_task_range, jobs))
+    else:
+        written = sum(_seed_task_range(job) for job in jobs)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")  # fresh planner stats before anyone benchmarks
+    return {"users": len(users), "tags": len(tags), "tasks": written}
+
+def _cli():
+    parser = argparse.ArgumentParser(
+        description="Seed the database: the small fixture set by default, or a synthetic dataset with --tasks.")
+    parser.add_argument("--tasks", type=int, help="generate this many tasks (scale mode)")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--attachments", type=float, default=0.5, help="mean attachments per task")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Zipf exponent for who owns/is tagged on tasks (0 = uniform)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=10000, help="rows per transaction")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="writer processes (Postgres)")
+    parser.add_argument("--no-copy", action="store_true", help="executemany INSERTs instead of COPY on Postgres")
+    args = parser.parse_args()
+
+    if args.tasks is None:
+        main()
+        return
+    started = time.perf_counter()
+    counts = seed_scale(args.users, args.tags, args.tasks, attachments=args.attachments, skew=args.skew,
+                        seed=args.seed, batch=args.batch, workers=args.workers, copy=not args.no_copy)
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {counts} in {elapsed:.1f}s ({counts['tasks'] / elapsed:,.0f} tasks/s)")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    _cli()
\ No newline at end of file
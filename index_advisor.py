@@ -0,0 +1,111 @@
+# index_advisor.py
+"""
+EXPLAIN every query the routers issue and fail if any of them needs a sequential scan on a
+large table. The statements come from the routers' own query helpers, not copies of them.
+
+Runs with `enable_seqscan = off`: Postgres then only picks a Seq Scan when no index can
+serve the query at all, so the check is meaningful even on a small dev database where the
+planner would happily seq-scan anyway.
+
+Usage (Postgres only, after `alembic upgrade head`):
+    DATABASE_URL=postgresql+psycopg://... python index_advisor.py
+Exit code 0 = every query has an index path, 1 = seq scans found, 2 = not Postgres.
+"""
+
+import json
+import sys
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from app_db import models as dbm
+from app_db.database import engine
+from app_db.queries import attachment_stats_statement, encode_cursor, keyset_page, link_id_statements, task_columns
+from app_db.search import search_statement
+from core.responses import fast_json_enabled
+from routers.attachments import task_attachments_statement
+from routers.todo import filter_tasks, DEFAULT_PAGE_SIZE
+
+# Tables expected to grow without bound; small lookup tables (users, tags, ...) may seq-scan.
+LARGE_TABLES = {"tasks", "task_assignees", "task_tags", "attachments"}
+
+
+def _as_sent(stmt):
+    # The list/search endpoints select plain columns on the fast path, ORM rows otherwise
+    return task_columns(stmt) if fast_json_enabled() else stmt
+
+
+def router_queries():
+    """
+    (name, statement) for each query the task/attachment endpoints send, built with the same
+    helpers and arguments the endpoints use - an endpoint change shows up here unedited.
+    """
+    some_id = uuid.uuid4()
+    page_ids = [uuid.uuid4() for _ in range(DEFAULT_PAGE_SIZE)]
+    cursor = encode_cursor(dbm.Task(id=some_id, created_at=datetime.now(timezone.utc)))
+
+    def list_tasks(status=None, assignee_id=None, tag_id=None, cursor=None):
+        # GET /todos/
+        stmt = filter_tasks(select(dbm.Task), status, assignee_id, tag_id)
+        return keyset_page(_as_sent(stmt), DEFAULT_PAGE_SIZE, cursor)
+
+    def search_tasks(offset=0):
+        # GET /todos/search
+        return _as_sent(search_statement(engine.dialect.name, "login bug", DEFAULT_PAGE_SIZE, offset))
+
+    assignees_stmt, tags_stmt = link_id_statements(page_ids)
+    return [
+        ("list_tasks", list_tasks()),
+        ("list_tasks next page", list_tasks(cursor=cursor)),
+        ("list_tasks status", list_tasks(status=dbm.TaskStatus.todo)),
+        ("list_tasks status next page", list_tasks(status=dbm.TaskStatus.todo, cursor=cursor)),
+        ("list_tasks assignee", list_tasks(assignee_id=some_id)),
+        ("list_tasks assignee next page", list_tasks(assignee_id=some_id, cursor=cursor)),
+        ("list_tasks tag", list_tasks(tag_id=some_id)),
+        ("list_tasks tag next page", list_tasks(tag_id=some_id, cursor=cursor)),
+        ("list_tasks status+tag", list_tasks(status=dbm.TaskStatus.todo, tag_id=some_id)),
+        ("task page: assignee ids", assignees_stmt),
+        ("task page: tag ids", tags_stmt),
+        ("task page: attachment stats", attachment_stats_statement(page_ids)),
+        ("search_tasks", search_tasks()),
+        ("search_tasks next page", search_tasks(offset=DEFAULT_PAGE_SIZE)),
+        ("list_attachments", task_attachments_statement(some_id)),
+        ("task_download_urls", task_attachments_statement(some_id, dbm.Attachment.id, dbm.Attachment.storage_key)),
+    ]
+
+
+def seq_scans(plan: dict) -> list:
+    """Relation names of every Seq Scan node in an EXPLAIN (FORMAT JSON) plan tree."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+
+def main() -> int:
+    if engine.dialect.name != "postgresql":
+        print(f"index_advisor needs Postgres (got {engine.dialect.name})")
+        return 2
+
+    failures = 0
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        for name, stmt in router_queries():
+            sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            raw = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql).scalar()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            bad = sorted({t for t in seq_scans(plan) if t in LARGE_TABLES})
+            if bad:
+                failures += 1
+                print(f"FAIL  {name}: seq scan on {', '.join(bad)}")
+            else:
+                print(f"ok    {name}")
+    print(f"\n{failures} quer{'y' if failures == 1 else 'ies'} without an index path")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
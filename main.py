@@ -1,9 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request, status
 from datetime import datetime
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 
-app = FastAPI() #creating instance of fastapi
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background drain of the storage deletion outbox (services/outbox.py)
+    from core.config import settings
+    from services.outbox import run_worker
+    stop = asyncio.Event()
+    worker = asyncio.create_task(run_worker(stop)) if settings.storage_deletion_worker else None
+    yield
+    stop.set()
+    if worker is not None:
+        await worker
+    from services.thumbnails import shutdown_pool
+    shutdown_pool()
+
+app = FastAPI(lifespan=lifespan) #creating instance of fastapi
+
+# Per-route latency/status + per-request SQL count/time, scraped at GET /metrics
+from core.instrumentation import MetricsMiddleware, instrument_engine
+from core.profiling import ProfilingMiddleware
+from app_db import database as _database
+app.add_middleware(ProfilingMiddleware)  # opt-in (PROFILING_ENABLED); added first = runs inside MetricsMiddleware
+app.add_middleware(MetricsMiddleware)
+instrument_engine(_database.engine)
+if _database.async_engine is not None:
+    instrument_engine(_database.async_engine.sync_engine)
 
 @app.get("/") #define route using this decorator - tells FastAPI that func root handles GET requests to root URL ("/")
 async def root():
@@ -73,6 +99,12 @@ app.include_router(lookup.router)
 from routers import attachments
 app.include_router(attachments.router)
 
+from routers import metrics
+app.include_router(metrics.router)
+
+from routers import admin
+app.include_router(admin.router)
+
 from core.config import settings
 print("CONFIG:", {
     "storage_backend": settings.storage_backend,
@@ -43,6 +43,9 @@ class TaskRead(BaseModel):
     created_by: UUID
     assignee_ids: List[UUID] = Field(default_factory=list)
     tag_ids: List[UUID] = Field(default_factory=list)
+    # Attachment badge; null when ATTACHMENT_STATS=off
+    attachment_count: Optional[int] = None
+    attachment_bytes: Optional[int] = None
 
 class TaskCreate(BaseModel):
     title: str
@@ -61,4 +64,28 @@ class TaskUpdate(BaseModel):
     priority: Optional[str] = None
     due_at: Optional[datetime] = None
     assignee_ids: Optional[List[UUID]] = None  # None=no change; []=clear all
-    tag_ids: Optional[List[UUID]] = None       # None=no change; []=clear all
\ No newline at end of file
+    tag_ids: Optional[List[UUID]] = None       # None=no change; []=clear all
+
+### Bulk endpoints (/todos/bulk)
+class TaskBulkUpdateItem(TaskUpdate):
+    id: UUID
+
+class TaskBulkCreate(BaseModel):
+    items: List[TaskCreate]
+
+class TaskBulkUpdate(BaseModel):
+    items: List[TaskBulkUpdateItem]
+
+class TaskBulkDelete(BaseModel):
+    ids: List[UUID]
+
+class BulkItemResult(BaseModel):
+    index: int                  # position in the request list
+    id: Optional[UUID] = None
+    ok: bool
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkItemResult] = Field(default_factory=list)
@@ -1,6 +1,6 @@
 # models_attachment.py
 from pydantic import BaseModel, Field
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from uuid import UUID
 from datetime import datetime
 
@@ -10,6 +10,9 @@ class AttachmentOut(BaseModel):
     filename: str
     content_type: Optional[str] = None
     size_bytes: Optional[int] = None
+    sha256: Optional[str] = None
+    preview_url: Optional[str] = None  # resized JPEG for images, once generated
+    uploaded_at: Optional[datetime] = None  # None until the upload has completed
     created_at: datetime
 
     class Config:
@@ -19,6 +22,9 @@ class PresignUploadRequest(BaseModel):
     filename: str
     content_type: Optional[str] = None
     size_bytes: Optional[int] = None
+    # Hex SHA-256 of the file; when given, S3 rejects a body that doesn't match it and
+    # POST /attachments/{id}/complete stores identical content once
+    sha256: Optional[str] = Field(default=None, pattern="^[0-9a-f]{64}$")
 
 class PresignUploadResponse(BaseModel):
     attachment_id: UUID
@@ -29,4 +35,56 @@ class PresignUploadResponse(BaseModel):
 
 class PresignDownloadResponse(BaseModel):
     url: str
-    expires_in: int
\ No newline at end of file
+    expires_in: int
+
+class BatchDownloadRequest(BaseModel):
+    attachment_ids: List[UUID] = Field(min_length=1, max_length=1000)
+
+class AttachmentDownload(BaseModel):
+    attachment_id: UUID
+    url: str
+    expires_in: int  # cached URLs have less than presigned_expires_seconds left
+
+class BatchDownloadResponse(BaseModel):
+    urls: List[AttachmentDownload]
+    missing: List[UUID] = Field(default_factory=list)  # requested IDs that don't exist
+
+# ---------- Multipart upload (S3) ----------
+
+class MultipartInitRequest(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    size_bytes: int = Field(gt=0)
+    part_size_bytes: Optional[int] = None  # default: settings.s3_multipart_part_bytes
+
+class PresignedPart(BaseModel):
+    part_number: int
+    url: str
+
+class MultipartInitResponse(BaseModel):
+    attachment_id: UUID
+    key: str
+    upload_id: str
+    part_size_bytes: int
+    parts: List[PresignedPart]  # PUT each part to its URL; keep the ETag response header
+    expires_in: int
+
+class MultipartPartsRequest(BaseModel):
+    upload_id: str
+    part_numbers: List[int] = Field(min_length=1, max_length=10_000)
+
+class MultipartPartsResponse(BaseModel):
+    parts: List[PresignedPart]
+    expires_in: int
+
+class CompletedPart(BaseModel):
+    part_number: int = Field(ge=1, le=10_000)
+    etag: str
+
+class MultipartCompleteRequest(BaseModel):
+    upload_id: str
+    parts: List[CompletedPart] = Field(min_length=1, max_length=10_000)
+
+class MultipartAbortRequest(BaseModel):
+    upload_id: str
+
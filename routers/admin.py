@@ -0,0 +1,51 @@
+# routers/admin.py
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from core.config import settings
+from core.profiling import list_reports, report_path
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+REPORT_ID = Path(..., pattern=r"^[0-9A-Za-z-]+$")  # ids from core/profiling.py; no path separators
+
+def _token_matches(given: Optional[str], expected: str) -> bool:
+    return hmac.compare_digest((given or "").encode(), expected.encode())
+
+def require_profiling(x_profile_token: Optional[str] = Header(None)):
+    # Reports expose internals (paths, queries, stack frames): hidden unless profiling is on
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not settings.profiling_token:
+        raise HTTPException(status_code=403, detail="Set PROFILING_TOKEN to read profiles")
+    if not _token_matches(x_profile_token, settings.profiling_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Destructive maintenance endpoints (e.g. multipart abort-stale): closed until ADMIN_TOKEN is set
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Set ADMIN_TOKEN to use maintenance endpoints")
+    if not _token_matches(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@router.get("/profiles", dependencies=[Depends(require_profiling)])
+async def list_profiles(limit: int = Query(50, ge=1, le=1000)):
+    """Profiled requests on this replica, newest first (phase timings; no stacks)."""
+    return {"directory": settings.profiling_dir, "reports": await run_in_threadpool(list_reports, limit)}
+
+@router.get("/profiles/{report_id}", dependencies=[Depends(require_profiling)])
+def get_profile(report_id: str = REPORT_ID):
+    path = report_path(report_id, ".json")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
+
+@router.get("/profiles/{report_id}/folded", dependencies=[Depends(require_profiling)])
+def get_profile_stacks(report_id: str = REPORT_ID):
+    """Collapsed stacks ("frame;frame;frame count" per line) - input for flamegraph.pl / speedscope."""
+    path = report_path(report_id, ".folded")
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{report_id}.folded")
@@ -1,29 +1,64 @@
 # routers/attachments.py
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
-from sqlalchemy.orm import Session
-from typing import List
+import os
+import re
+from datetime import datetime, timezone
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy import Select, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from uuid import uuid4, UUID
 from core.config import settings
-from services.storage import get_storage
-from app_db.session import get_session
+from core.conditional import http_date, not_modified
+from core.profiling import ProfiledRoute
+from botocore.exceptions import ClientError
+from services.storage import get_storage, presigned_download, UploadTooLarge
+from services.storage.s3 import MIN_PART_BYTES, MAX_PARTS
+from services.blobs import acquire_blob
+from services.outbox import enqueue_deletion, release_object
+from services.thumbnails import derive_preview, is_previewable
+from app_db.session import get_db
 from app_db import models as dbm
+from routers.admin import require_admin
 from models_attachment import (
     PresignUploadRequest, PresignUploadResponse,
-    AttachmentOut, PresignDownloadResponse
+    AttachmentOut, PresignDownloadResponse,
+    BatchDownloadRequest, BatchDownloadResponse, AttachmentDownload,
+    MultipartInitRequest, MultipartInitResponse, MultipartPartsRequest, MultipartPartsResponse,
+    MultipartCompleteRequest, MultipartAbortRequest, PresignedPart,
 )
 
-router = APIRouter(prefix="/attachments", tags=["attachments"])
+router = APIRouter(prefix="/attachments", tags=["attachments"], route_class=ProfiledRoute)
 
-def _ensure_task(db: Session, task_id: UUID) -> dbm.Task:
-    t = db.get(dbm.Task, task_id)
+_SHA256_NAME = re.compile(r"[0-9a-f]{64}")
+
+async def _ensure_task(db: AsyncSession, task_id: UUID) -> dbm.Task:
+    t = await db.get(dbm.Task, task_id)
     if not t:
         raise HTTPException(status_code=404, detail="Task not found")
     return t
 
+def _attachment_out(att: dbm.Attachment) -> AttachmentOut:
+    out = AttachmentOut.model_validate(att)
+    if att.preview_key:
+        out.preview_url, _ = presigned_download(att.preview_key)
+    return out
+
+def _queue_preview(background: BackgroundTasks, att: dbm.Attachment) -> bool:
+    # Runs after the response is sent; the resize itself happens in the thumbnail process pool
+    if att.preview_key or not is_previewable(att.content_type, att.size_bytes):
+        return False
+    background.add_task(derive_preview, att.id)
+    return True
+
 @router.post("/tasks/{task_id}/presign-upload", response_model=PresignUploadResponse)
-def presign_upload(task_id: UUID, body: PresignUploadRequest, db: Session = Depends(get_session)):
-    _ensure_task(db, task_id)
-    # Build key: attachments/{task_id}/{uuid}.{ext}
+async def presign_upload(task_id: UUID, body: PresignUploadRequest, db: AsyncSession = Depends(get_db)):
+    await _ensure_task(db, task_id)
+    storage = get_storage()
+    # Build key: attachments/{task_id}/{uuid}.{ext}. Always a fresh key, even with a sha256: a
+    # known hash is no proof of having the file, so deduplication waits for the bytes
+    # (POST /attachments/{id}/complete) and never links to an existing blob up front.
     ext = body.filename.rsplit(".", 1)[-1] if "." in body.filename else "bin"
     key = f"{settings.aws_s3_prefix}{task_id}/{uuid4().hex}.{ext}"
 
@@ -34,81 +69,362 @@ def presign_upload(task_id: UUID, body: PresignUploadRequest, db: Session = Depe
         filename=body.filename,
         content_type=body.content_type,
         size_bytes=body.size_bytes,
+        sha256=body.sha256,  # claimed until /complete has checked the stored bytes
         storage_key=key,
     )
     db.add(att)
-    db.commit()
-    db.refresh(att)
+    await db.commit()
+    await db.refresh(att)
+
+    url, fields = storage.presign_upload(key, body.content_type, settings.presigned_expires_seconds, body.sha256)
+    return PresignUploadResponse(
+        attachment_id=att.id, key=key, upload_url=url, fields=fields, method="POST",
+    )
+
+async def _lock_attachment(db: AsyncSession, attachment_id: UUID) -> Optional[dbm.Attachment]:
+    """
+    Lock the attachment row for the rest of the transaction and reload it. A no-op UPDATE
+    rather than SELECT ... FOR UPDATE, which SQLite ignores: the UPDATE takes the row lock on
+    Postgres and the database write lock on SQLite, so a concurrent caller waits for our commit.
+    """
+    locked = await db.execute(
+        update(dbm.Attachment)
+        .where(dbm.Attachment.id == attachment_id)
+        .values(storage_key=dbm.Attachment.storage_key)
+        .execution_options(synchronize_session=False)
+    )
+    if locked.rowcount != 1:
+        return None
+    return await db.get(dbm.Attachment, attachment_id, populate_existing=True)
+
+@router.post("/{attachment_id}/complete", response_model=AttachmentOut)
+async def complete_upload(attachment_id: UUID, background: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    """
+    Call after the presigned upload succeeded. When the attachment was presigned with a sha256,
+    the stored bytes are hashed (S3: the checksum it verified on upload) and, if they match,
+    the attachment moves onto the shared blob for that content - the upload is deduplicated
+    only once the caller has proven it had the bytes. Until then the attachment is not listed,
+    downloadable or counted on the task.
+    """
+    att = await db.get(dbm.Attachment, attachment_id)
+    if not att:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    if att.uploaded_at is not None:
+        _queue_preview(background, att)
+        return _attachment_out(att)
 
     storage = get_storage()
-    url, fields = storage.presign_upload(key, body.content_type, settings.presigned_expires_seconds)
+    upload_key = att.storage_key
+    if att.sha256:
+        # Hash before taking the lock: reading a large object must not hold up other writers
+        actual = await storage.object_sha256(upload_key)
+        if actual is None:
+            raise HTTPException(status_code=409, detail="Upload has not completed")
+        if actual != att.sha256:
+            raise HTTPException(status_code=422, detail="Uploaded content does not match sha256")
+    elif not await storage.object_exists(upload_key):
+        raise HTTPException(status_code=409, detail="Upload has not completed")
 
-    return PresignUploadResponse(
-        attachment_id=att.id, key=key, upload_url=url, fields=fields, method="POST"
+    att = await _lock_attachment(db, attachment_id)
+    if att is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    if att.uploaded_at is not None:
+        out = _attachment_out(att)  # before the rollback expires att
+        await db.rollback()  # a concurrent /complete finished it while we were checking
+        return out
+
+    if att.sha256:
+        key, created = await acquire_blob(db, att.sha256, att.size_bytes)
+        if created or not await storage.object_exists(key):
+            # Copy, not move: until the commit below the row still points at upload_key
+            await storage.copy_object(upload_key, key)
+        att.storage_key = key
+        att.blob_sha256 = att.sha256
+        enqueue_deletion(db, upload_key)  # committed together with the repoint; the outbox removes it
+    att.uploaded_at = datetime.now(timezone.utc)  # the after_update hook counts it on the task now
+    await db.commit()
+    await db.refresh(att)
+    _queue_preview(background, att)
+    return _attachment_out(att)
+
+def task_attachments_statement(task_id: UUID, *columns) -> Select:
+    # A task's uploaded attachments (or just `columns` of them), newest first; index_advisor.py checks it
+    return (
+        select(*(columns or (dbm.Attachment,)))
+        .where(dbm.Attachment.task_id == task_id, dbm.Attachment.uploaded_at.is_not(None))
+        .order_by(dbm.Attachment.created_at.desc())
     )
 
 @router.get("/tasks/{task_id}", response_model=List[AttachmentOut])
-def list_attachments(task_id: UUID, db: Session = Depends(get_session)):
-    _ensure_task(db, task_id)
-    q = db.query(dbm.Attachment).filter(dbm.Attachment.task_id == task_id).order_by(dbm.Attachment.created_at.desc())
-    return q.all()
+async def list_attachments(task_id: UUID, db: AsyncSession = Depends(get_db)):
+    await _ensure_task(db, task_id)
+    q = task_attachments_statement(task_id)
+    return [_attachment_out(a) for a in (await db.scalars(q)).all()]
 
-@router.get("/{attachment_id}/download-url", response_model=PresignDownloadResponse)
-def get_download_url(attachment_id: UUID, db: Session = Depends(get_session)):
-    att = db.get(dbm.Attachment, attachment_id)
+@router.post("/{attachment_id}/preview", status_code=202)
+async def request_preview(attachment_id: UUID, background: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    """Queue preview generation, e.g. once a presigned POST upload has finished."""
+    att = await db.get(dbm.Attachment, attachment_id)
     if not att:
         raise HTTPException(status_code=404, detail="Attachment not found")
-    storage = get_storage()
-    url = storage.presign_download(att.storage_key, settings.presigned_expires_seconds)
-    return PresignDownloadResponse(url=url, expires_in=settings.presigned_expires_seconds)
+    return {"queued": _queue_preview(background, att), "preview_ready": att.preview_key is not None}
+
+@router.get("/{attachment_id}/download-url", response_model=PresignDownloadResponse)
+async def get_download_url(attachment_id: UUID, db: AsyncSession = Depends(get_db)):
+    att = await db.get(dbm.Attachment, attachment_id)
+    if not att or att.uploaded_at is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    url, expires_in = presigned_download(att.storage_key)
+    return PresignDownloadResponse(url=url, expires_in=expires_in)
+
+def _download_urls(rows) -> List[AttachmentDownload]:
+    out = []
+    for attachment_id, storage_key in rows:
+        url, expires_in = presigned_download(storage_key)
+        out.append(AttachmentDownload(attachment_id=attachment_id, url=url, expires_in=expires_in))
+    return out
+
+@router.post("/download-urls", response_model=BatchDownloadResponse)
+async def batch_download_urls(body: BatchDownloadRequest, db: AsyncSession = Depends(get_db)):
+    # One IN (...) query for every row instead of a db.get per attachment; pending uploads are missing
+    wanted = list(dict.fromkeys(body.attachment_ids))
+    q = select(dbm.Attachment.id, dbm.Attachment.storage_key).where(
+        dbm.Attachment.id.in_(wanted), dbm.Attachment.uploaded_at.is_not(None),
+    )
+    keys = {row.id: row.storage_key for row in (await db.execute(q)).all()}
+    return BatchDownloadResponse(
+        urls=_download_urls((i, keys[i]) for i in wanted if i in keys),  # request order
+        missing=[i for i in wanted if i not in keys],
+    )
+
+@router.get("/tasks/{task_id}/download-urls", response_model=BatchDownloadResponse)
+async def task_download_urls(task_id: UUID, db: AsyncSession = Depends(get_db)):
+    await _ensure_task(db, task_id)
+    q = task_attachments_statement(task_id, dbm.Attachment.id, dbm.Attachment.storage_key)
+    return BatchDownloadResponse(urls=_download_urls((await db.execute(q)).all()))
 
 @router.delete("/{attachment_id}", status_code=204)
-def delete_attachment(attachment_id: UUID, db: Session = Depends(get_session)):
-    att = db.get(dbm.Attachment, attachment_id)
+async def delete_attachment(attachment_id: UUID, db: AsyncSession = Depends(get_db)):
+    att = await db.get(dbm.Attachment, attachment_id)
     if not att:
         raise HTTPException(status_code=404, detail="Attachment not found")
-    storage = get_storage()
-    try:
-        storage.delete_object(att.storage_key)
-    finally:
-        db.delete(att)
-        db.commit()
+    # Deduplicated objects are shared: only the last reference queues the object for deletion.
+    # The outbox row commits with the delete; the background worker removes the object.
+    await db.delete(att)
+    await release_object(db, att.storage_key, att.blob_sha256)
+    await db.commit()
     return
 
-# ---------- Local backend only ----------
+# ---------- S3 backend only: multipart upload ----------
+# initiate -> PUT parts in parallel to the presigned URLs -> complete with the part ETags.
+# Re-presign any part (expired URL, resumed upload) via /parts; abort discards the upload.
 
-@router.post("/tasks/{task_id}/upload-direct")
-async def upload_direct(task_id: UUID, file: UploadFile = File(...), db: Session = Depends(get_session)):
-    if settings.storage_backend != "local":
-        raise HTTPException(status_code=400, detail="upload-direct only for local backend")
+ABORT_STALE_BATCH = 500  # keys per IN (...) lookup
 
-    _ensure_task(db, task_id)
+def _require_s3():
+    if settings.storage_backend != "s3":
+        raise HTTPException(status_code=400, detail="multipart upload only for s3 backend")
 
-    # key naming compatible with S3 path layout
-    original_ext = file.filename.rsplit(".", 1)[-1] if "." in file.filename else "bin"
-    key = f"{settings.aws_s3_prefix}{task_id}/{uuid4().hex}.{original_ext}"
+async def _pending_attachment(db: AsyncSession, task_id: UUID, attachment_id: UUID) -> dbm.Attachment:
+    att = await db.get(dbm.Attachment, attachment_id)
+    if not att or att.task_id != task_id:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return att
 
-    storage = get_storage()  # LocalStorage
-    # save locally
-    storage.save_file(key, file)
+def _s3_error(e: ClientError) -> HTTPException:
+    code = e.response.get("Error", {}).get("Code", "")
+    if code == "NoSuchUpload":
+        return HTTPException(status_code=404, detail="Upload not found (completed, aborted or expired)")
+    return HTTPException(status_code=400, detail=f"S3 rejected the request: {code or e}")
+
+@router.post("/tasks/{task_id}/multipart/initiate", response_model=MultipartInitResponse)
+async def multipart_initiate(task_id: UUID, body: MultipartInitRequest, db: AsyncSession = Depends(get_db)):
+    _require_s3()
+    await _ensure_task(db, task_id)
+
+    part_size = body.part_size_bytes or settings.s3_multipart_part_bytes
+    # Grow the part size if the file would need more than MAX_PARTS parts
+    part_size = max(part_size, MIN_PART_BYTES, -(-body.size_bytes // MAX_PARTS))
+    part_count = -(-body.size_bytes // part_size)
+
+    ext = body.filename.rsplit(".", 1)[-1] if "." in body.filename else "bin"
+    key = f"{settings.aws_s3_prefix}{task_id}/{uuid4().hex}.{ext}"
+    storage = get_storage()
+    upload_id = await run_in_threadpool(storage.create_multipart_upload, key, body.content_type)
 
     att = dbm.Attachment(
         task_id=task_id,
         uploader_id=None,
-        filename=file.filename,
-        content_type=file.content_type,
-        size_bytes=None,
+        filename=body.filename,
+        content_type=body.content_type,
+        size_bytes=body.size_bytes,
         storage_key=key,
     )
     db.add(att)
-    db.commit()
-    db.refresh(att)
-    return {"attachment_id": str(att.id), "key": key}
-
-@router.get("/local-download")
-def local_download(path: str = Query(..., description="Absolute path inside LOCAL_STORAGE_DIR")):
-    import os
-    from fastapi.responses import FileResponse
-    if not os.path.exists(path):
+    await db.commit()
+    await db.refresh(att)
+
+    expires = settings.presigned_expires_seconds
+    urls = await run_in_threadpool(storage.presign_upload_parts, key, upload_id, range(1, part_count + 1), expires)
+    return MultipartInitResponse(
+        attachment_id=att.id, key=key, upload_id=upload_id, part_size_bytes=part_size,
+        parts=[PresignedPart(part_number=n, url=url) for n, url in urls], expires_in=expires,
+    )
+
+@router.post("/tasks/{task_id}/multipart/{attachment_id}/parts", response_model=MultipartPartsResponse)
+async def multipart_presign_parts(task_id: UUID, attachment_id: UUID, body: MultipartPartsRequest,
+                                  db: AsyncSession = Depends(get_db)):
+    _require_s3()
+    att = await _pending_attachment(db, task_id, attachment_id)
+    if any(not 1 <= n <= MAX_PARTS for n in body.part_numbers):
+        raise HTTPException(status_code=422, detail=f"part numbers must be between 1 and {MAX_PARTS}")
+    expires = settings.presigned_expires_seconds
+    urls = await run_in_threadpool(
+        get_storage().presign_upload_parts, att.storage_key, body.upload_id, body.part_numbers, expires,
+    )
+    return MultipartPartsResponse(parts=[PresignedPart(part_number=n, url=url) for n, url in urls], expires_in=expires)
+
+@router.post("/tasks/{task_id}/multipart/{attachment_id}/complete", response_model=AttachmentOut)
+async def multipart_complete(task_id: UUID, attachment_id: UUID, body: MultipartCompleteRequest,
+                             background: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    _require_s3()
+    att = await _pending_attachment(db, task_id, attachment_id)
+    parts = {p.part_number: p.etag for p in body.parts}
+    if len(parts) != len(body.parts):
+        raise HTTPException(status_code=422, detail="duplicate part numbers")
+    try:
+        size = await run_in_threadpool(
+            get_storage().complete_multipart_upload, att.storage_key, body.upload_id, parts.items(),
+        )
+    except ClientError as e:
+        raise _s3_error(e)
+    att = await _lock_attachment(db, attachment_id)
+    if att is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    if att.uploaded_at is None:  # S3 is idempotent here; the row must only be counted once
+        att.size_bytes = size  # what actually landed, not what the client announced
+        att.uploaded_at = datetime.now(timezone.utc)
+    await db.commit()
+    await db.refresh(att)
+    _queue_preview(background, att)
+    return _attachment_out(att)
+
+@router.post("/tasks/{task_id}/multipart/{attachment_id}/abort", status_code=204)
+async def multipart_abort(task_id: UUID, attachment_id: UUID, body: MultipartAbortRequest,
+                          db: AsyncSession = Depends(get_db)):
+    _require_s3()
+    att = await _pending_attachment(db, task_id, attachment_id)
+    if att.uploaded_at is not None:
+        raise HTTPException(status_code=409, detail="Upload already completed; delete the attachment instead")
+    try:
+        await run_in_threadpool(get_storage().abort_multipart_upload, att.storage_key, body.upload_id)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+            raise _s3_error(e)
+    await db.delete(att)
+    await db.commit()
+    return
+
+@router.post("/multipart/abort-stale", dependencies=[Depends(require_admin)])
+async def multipart_abort_stale(older_than_seconds: Optional[int] = Query(None, ge=0),
+                                db: AsyncSession = Depends(get_db)):
+    """
+    Abort multipart uploads nobody completed (run from cron with X-Admin-Token; S3 bills their
+    parts until then) and delete their pending attachment rows.
+    """
+    _require_s3()
+    cutoff = settings.s3_multipart_stale_seconds if older_than_seconds is None else older_than_seconds
+    aborted = await run_in_threadpool(get_storage().abort_stale_multipart_uploads, cutoff, settings.aws_s3_prefix)
+    # Every upload gets its own key at initiate, so the key identifies the attachment row
+    keys = [key for key, _upload_id in aborted]
+    deleted = 0
+    for i in range(0, len(keys), ABORT_STALE_BATCH):
+        rows = await db.scalars(
+            select(dbm.Attachment).where(
+                dbm.Attachment.storage_key.in_(keys[i:i + ABORT_STALE_BATCH]),
+                dbm.Attachment.uploaded_at.is_(None),
+            )
+        )
+        for att in rows.all():
+            await db.delete(att)
+            deleted += 1
+    await db.commit()
+    return {"aborted": len(aborted), "attachments_deleted": deleted, "older_than_seconds": cutoff}
+
+# ---------- Local backend only ----------
+
+@router.post("/tasks/{task_id}/upload-direct")
+async def upload_direct(task_id: UUID, background: BackgroundTasks, file: UploadFile = File(...),
+                        db: AsyncSession = Depends(get_db)):
+    if settings.storage_backend != "local":
+        raise HTTPException(status_code=400, detail="upload-direct only for local backend")
+
+    await _ensure_task(db, task_id)
+
+    storage = get_storage()  # LocalStorage
+    # save under a temporary name first: the final key depends on the content hash
+    tmp_key = storage.temp_key(".upload")
+    # Early reject when the multipart part already tells us it's too big
+    if file.size is not None and file.size > settings.max_upload_bytes:
+        raise HTTPException(status_code=413, detail=f"File exceeds {settings.max_upload_bytes} bytes")
+    # save locally: chunked, off the event loop, size + sha256 computed on the way
+    try:
+        _path, size_bytes, sha256 = await storage.save_stream(tmp_key, file, settings.max_upload_bytes)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"File exceeds {settings.max_upload_bytes} bytes")
+
+    try:
+        key, created = await acquire_blob(db, sha256, size_bytes)
+        att = dbm.Attachment(
+            task_id=task_id,
+            uploader_id=None,
+            filename=file.filename,
+            content_type=file.content_type,
+            size_bytes=size_bytes,
+            sha256=sha256,
+            storage_key=key,
+            blob_sha256=sha256,
+            uploaded_at=datetime.now(timezone.utc),
+        )
+        db.add(att)
+        await db.flush()
+        if created or not await storage.object_exists(key):
+            await storage.move_object(tmp_key, key)
+        await db.commit()
+    finally:
+        # Duplicate content (or a failed insert): the temp copy is not needed
+        await storage.delete_object(tmp_key)
+    await db.refresh(att)
+    preview_queued = _queue_preview(background, att)
+    return {
+        "attachment_id": str(att.id), "key": key, "size_bytes": size_bytes, "sha256": sha256,
+        "deduplicated": not created, "preview_queued": preview_queued,
+    }
+
+@router.api_route("/local-download", methods=["GET", "HEAD"])
+async def local_download(request: Request, path: str = Query(..., description="Absolute path inside LOCAL_STORAGE_DIR")):
+    if settings.storage_backend != "local":
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(path))
\ No newline at end of file
+    # Confined to LOCAL_STORAGE_DIR; unmigrated files are found at their legacy flat path
+    path = await run_in_threadpool(get_storage().resolve_download_path, path)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    st = await run_in_threadpool(os.stat, path)
+
+    name = os.path.basename(path)
+    # Content-addressed blobs are named by their sha256: that is the strongest validator there is.
+    # Anything else falls back to FileResponse's own mtime+size tag.
+    etag = f'"{name}"' if _SHA256_NAME.fullmatch(name) else None
+    last_modified = datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
+    if etag and not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers={"ETag": etag, "Last-Modified": http_date(last_modified)})
+
+    # FileResponse handles Range (single -> 206, multiple -> multipart/byteranges), If-Range,
+    # 416, HEAD, and hands the whole file to the server via pathsend (sendfile) when offered.
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=name,
+        stat_result=st,
+        headers={"ETag": etag} if etag else None,
+    )
@@ -1,16 +1,31 @@
 # routers/lookup.py
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app_db.session import get_session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app_db.session import get_db
 from app_db import models as dbm
+from core.profiling import ProfiledRoute
+from services.cache import lookup_cache, USERS_LIST, TAGS_LIST
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 @router.get("/users")
-def list_users(db: Session = Depends(get_session)):
-    return [{"id": u.id, "email": u.email, "name": f"{u.first_name} {u.last_name or ''}".strip()}
-            for u in db.query(dbm.User).order_by(dbm.User.email)]
+async def list_users(db: AsyncSession = Depends(get_db)):
+    cached = lookup_cache.get(USERS_LIST)
+    if cached is not None:
+        return cached
+    users = await db.scalars(select(dbm.User).order_by(dbm.User.email))
+    result = [{"id": u.id, "email": u.email, "name": f"{u.first_name} {u.last_name or ''}".strip()}
+              for u in users]
+    lookup_cache.set(USERS_LIST, result)
+    return result
 
 @router.get("/tags")
-def list_tags(db: Session = Depends(get_session)):
-    return [{"id": t.id, "name": t.name} for t in db.query(dbm.Tag).order_by(dbm.Tag.name)]
\ No newline at end of file
+async def list_tags(db: AsyncSession = Depends(get_db)):
+    cached = lookup_cache.get(TAGS_LIST)
+    if cached is not None:
+        return cached
+    tags = await db.scalars(select(dbm.Tag).order_by(dbm.Tag.name))
+    result = [{"id": t.id, "name": t.name} for t in tags]
+    lookup_cache.set(TAGS_LIST, result)
+    return result
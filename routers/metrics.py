@@ -0,0 +1,54 @@
+# routers/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app_db import database
+from app_db.pool_metrics import pool_snapshot
+from core.config import settings
+from core.instrumentation import render_metrics
+from services.cache import lookup_cache, presign_cache
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+_POOL_COUNTERS = {"checkouts", "connections_opened", "overflow_opened", "timeouts"}
+
+def _pool_gauges():
+    # The pool snapshots from /metrics/db-pool, flattened to gauges labelled by engine
+    engines = [("sync", database.engine)]
+    if database.async_engine is not None:
+        engines.append(("async", database.async_engine))
+    seen = set()
+    for label, eng in engines:
+        for key, value in (pool_snapshot(eng.pool) or {}).items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            kind = "counter" if key in _POOL_COUNTERS else "gauge"
+            name = f"db_pool_{key}" + ("_total" if kind == "counter" else "")
+            if name not in seen:
+                seen.add(name)
+                yield f"# TYPE {name} {kind}"
+            yield f'{name}{{engine="{label}"}} {value}'
+
+@router.get("", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus scrape target: request/SQL histograms (core/instrumentation.py) + pool gauges."""
+    return PlainTextResponse(render_metrics(_pool_gauges()), media_type="text/plain; version=0.0.4")
+
+@router.get("/db-pool")
+def db_pool_metrics():
+    # Per-process view: scrape every replica and sum to compare against Postgres max_connections
+    return {
+        "config": {
+            "pool_size": settings.db_pool_size,
+            "max_overflow": settings.db_max_overflow,
+            "pool_timeout": settings.db_pool_timeout,
+            "pool_recycle": settings.db_pool_recycle,
+            "pool_pre_ping": settings.db_pool_pre_ping,
+        },
+        "sync": pool_snapshot(database.engine.pool),
+        "async": pool_snapshot(database.async_engine.pool) if database.async_engine is not None else None,
+    }
+
+
+@router.get("/cache")
+def cache_metrics():
+    return {"lookup": lookup_cache.stats(), "presign": presign_cache.stats()}
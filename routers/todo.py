@@ -1,18 +1,52 @@
 # routers/todo.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from uuid import UUID
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+from uuid import UUID, uuid4
 from datetime import datetime, timezone
 
-from app_db.session import get_session
+from app_db.database import SessionLocal, engine
+from core.config import settings
+from app_db.search import like_search_statement, search_statement
+from app_db.session import get_db
+from core.profiling import ProfiledRoute, phase
+from core.conditional import make_etag, http_date, not_modified, none_match, if_match_fails
 from app_db import models as dbm
-from models import TaskRead, TaskCreate, TaskUpdate
+from app_db.queries import (
+    load_link_ids, load_link_ids_async, keyset_page, split_page, existing_refs_statement,
+    load_attachment_stats, load_attachment_stats_async, StatsMap, task_columns,
+)
+from core.responses import FastJSONResponse, fast_json_enabled
+from services.cache import lookup_cache, user_key, tag_key
+from services.outbox import release_task_objects
+from models import (
+    TaskRead, TaskCreate, TaskUpdate,
+    TaskBulkCreate, TaskBulkUpdate, TaskBulkDelete, BulkItemResult, BulkResult,
+)
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
-def to_task_read(t: dbm.Task) -> TaskRead:
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+MAX_BULK_ITEMS = 1000
+DUPLICATE_ID_ERROR = "Task id appears more than once"
+
+def to_task_read(
+    t: dbm.Task,
+    assignee_ids: Optional[List[UUID]] = None,
+    tag_ids: Optional[List[UUID]] = None,
+    attachment_stats: Optional[Tuple[int, int]] = None,
+) -> TaskRead:
     # Map ORM Task -> Pydantic TaskRead
+    # Pass pre-loaded IDs (see to_task_reads) to avoid lazy-loading the relationships per row.
+    attachment_count, attachment_bytes = attachment_stats or (None, None)
     return TaskRead(
         id=t.id,
         title=t.title,
@@ -24,45 +58,431 @@ def to_task_read(t: dbm.Task) -> TaskRead:
         completed_at=t.completed_at,
         updated_at=t.updated_at,
         created_by=t.created_by,
-        assignee_ids=[u.id for u in t.assignees],
-        tag_ids=[tag.id for tag in t.tags],
+        assignee_ids=assignee_ids if assignee_ids is not None else [u.id for u in t.assignees],
+        tag_ids=tag_ids if tag_ids is not None else [tag.id for tag in t.tags],
+        attachment_count=attachment_count,
+        attachment_bytes=attachment_bytes,
     )
 
+def task_read_dict(
+    t,
+    assignee_ids: List[UUID],
+    tag_ids: List[UUID],
+    attachment_stats: Optional[Tuple[int, int]] = None,
+) -> dict:
+    # Fast path: TaskRead's JSON shape straight from a task_columns() row. Field for field the
+    # same as to_task_read, minus the model instance and its validation (keep the two in sync).
+    attachment_count, attachment_bytes = attachment_stats or (None, None)
+    return {
+        "id": t.id,
+        "title": t.title,
+        "description": t.description,
+        "status": t.status.value,
+        "priority": t.priority.value,
+        "created_at": t.created_at,
+        "due_at": t.due_at,
+        "completed_at": t.completed_at,
+        "updated_at": t.updated_at,
+        "created_by": t.created_by,
+        "assignee_ids": assignee_ids,
+        "tag_ids": tag_ids,
+        "attachment_count": attachment_count,
+        "attachment_bytes": attachment_bytes,
+    }
+
+def _stats_for(tasks: List[dbm.Task], aggregated: StatsMap) -> dict:
+    # {task_id: (count, bytes) or None} according to settings.attachment_stats
+    mode = settings.attachment_stats
+    if mode == "counter":
+        return {t.id: (t.attachment_count, t.attachment_bytes) for t in tasks}
+    if mode == "aggregate":
+        return {t.id: aggregated.get(t.id, (0, 0)) for t in tasks}
+    return {}
+
+def to_task_reads(db: Session, tasks: List[dbm.Task]) -> List[TaskRead]:
+    # Bulk variant: 2 extra SELECTs for the whole list instead of 2 per task (+1 for attachment stats)
+    ids = [t.id for t in tasks]
+    assignees, tags = load_link_ids(db, ids)
+    aggregated = load_attachment_stats(db, ids) if settings.attachment_stats == "aggregate" else {}
+    stats = _stats_for(tasks, aggregated)
+    with phase("serialize"):
+        return [to_task_read(t, assignees[t.id], tags[t.id], stats.get(t.id)) for t in tasks]
+
+async def _page_refs_async(db: AsyncSession, tasks) -> tuple:
+    ids = [t.id for t in tasks]
+    assignees, tags = await load_link_ids_async(db, ids)
+    aggregated = await load_attachment_stats_async(db, ids) if settings.attachment_stats == "aggregate" else {}
+    return assignees, tags, _stats_for(tasks, aggregated)
+
+async def to_task_reads_async(db: AsyncSession, tasks: List[dbm.Task]) -> List[TaskRead]:
+    # Same as to_task_reads for the get_db handle (relationships are never lazy-loaded here)
+    assignees, tags, stats = await _page_refs_async(db, tasks)
+    with phase("serialize"):
+        return [to_task_read(t, assignees[t.id], tags[t.id], stats.get(t.id)) for t in tasks]
+
+async def task_list_response(db: AsyncSession, rows, headers: dict) -> FastJSONResponse:
+    # Returned as a Response, so FastAPI skips response_model for it; headers must be passed here
+    assignees, tags, stats = await _page_refs_async(db, rows)
+    with phase("serialize"):
+        body = [task_read_dict(t, assignees[t.id], tags[t.id], stats.get(t.id)) for t in rows]
+    return FastJSONResponse(body, headers=headers)
+
+def task_etag(t: dbm.Task) -> str:
+    # updated_at is bumped by every write path (incl. assignee/tag changes), so it versions the TaskRead
+    return make_etag(t.id, t.updated_at.isoformat())
+
+def _cache_headers(t: dbm.Task) -> dict:
+    return {"ETag": task_etag(t), "Last-Modified": http_date(t.updated_at)}
+
+def parse_status(status: Optional[str]) -> Optional[dbm.TaskStatus]:
+    if not status:
+        return None
+    try:
+        return dbm.TaskStatus(status)
+    except ValueError:
+        raise HTTPException(400, "Invalid status")
+
+def filter_tasks(q, status: Optional[dbm.TaskStatus], assignee_id: Optional[UUID], tag_id: Optional[UUID]):
+    # Shared by the paginated listing and the streaming export
+    if status:
+        q = q.filter(dbm.Task.status == status)
+    # Filter on the link tables directly (no join to users/tags); served by the
+    # (user_id, task_id) / (tag_id, task_id) indexes
+    if assignee_id:
+        q = q.join(dbm.TaskAssignee, dbm.TaskAssignee.task_id == dbm.Task.id).filter(dbm.TaskAssignee.user_id == assignee_id)
+    if tag_id:
+        q = q.join(dbm.TaskTag, dbm.TaskTag.task_id == dbm.Task.id).filter(dbm.TaskTag.tag_id == tag_id)
+    return q
+
+async def _existing_refs(db: AsyncSession, user_ids: set, tag_ids: set):
+    # Which of these user/tag IDs exist? Known IDs come from the lookup cache;
+    # the rest are checked in one query and cached on the way out.
+    users = {u for u in user_ids if lookup_cache.get(user_key(u))}
+    tags = {t for t in tag_ids if lookup_cache.get(tag_key(t))}
+    missing_users, missing_tags = set(user_ids) - users, set(tag_ids) - tags
+    if missing_users or missing_tags:
+        for ref_id, kind in (await db.execute(existing_refs_statement(missing_users, missing_tags))).all():
+            if kind == "user":
+                users.add(ref_id)
+                lookup_cache.set(user_key(ref_id), True)
+            else:
+                tags.add(ref_id)
+                lookup_cache.set(tag_key(ref_id), True)
+    return users, tags
+
+def _is_fk_violation(e: IntegrityError) -> bool:
+    # psycopg reports SQLSTATE 23503; SQLite (PRAGMA foreign_keys=ON) only has the message
+    return getattr(e.orig, "sqlstate", None) == "23503" or "FOREIGN KEY" in str(e.orig)
+
+@asynccontextmanager
+async def _refs_still_exist(db: AsyncSession, user_ids, tag_ids):
+    """
+    Wrap the writes (and commit) that rely on _existing_refs. Its positives are cached per
+    process, so a user/tag another replica deleted can still pass the check; the FK then
+    rejects the write. Drop those cache entries and answer 400 - a retry re-checks them.
+    """
+    try:
+        yield
+    except IntegrityError as e:
+        if not _is_fk_violation(e):
+            raise
+        await db.rollback()
+        lookup_cache.invalidate(*(user_key(u) for u in user_ids), *(tag_key(t) for t in tag_ids))
+        raise HTTPException(status_code=400, detail="A referenced user or tag no longer exists; retry the request")
+
 #@router.get("/todos/", response_model=List[TaskRead])
 #def list_tasks(db: Session = Depends(get_session)):
 #    tasks = db.query(dbm.Task).order_by(dbm.Task.created_at.desc()).all()
 #    return [to_task_read(t) for t in tasks]
 
 @router.get("/todos/", response_model=List[TaskRead])
-def list_tasks(
+async def list_tasks(
+    request: Request,
+    response: Response,
     status: Optional[str] = Query(None),
     assignee_id: Optional[UUID] = Query(None),
     tag_id: Optional[UUID] = Query(None),
-    db: Session = Depends(get_session),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's X-Next-Cursor header"),
+    db: AsyncSession = Depends(get_db),
 ):
-    q = db.query(dbm.Task)
-    if status:
+    fast = fast_json_enabled()
+    stmt = filter_tasks(select(dbm.Task), parse_status(status), assignee_id, tag_id)
+    if fast:
+        stmt = task_columns(stmt)
+
+    # Keyset pagination on (created_at, id); body stays a plain list, next page via header
+    try:
+        stmt = keyset_page(stmt, limit, cursor)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    rows = (await db.execute(stmt) if fast else await db.scalars(stmt)).all()
+    tasks, next_cursor = split_page(rows, limit)
+
+    # Collection version: the page's (id, updated_at) pairs. Inserts, deletes and edits
+    # within the page all change it. (No Last-Modified: a delete doesn't move max(updated_at).)
+    etag = make_etag(*(f"{t.id}@{t.updated_at.isoformat()}" for t in tasks))
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if none_match(request, etag):
+        return Response(status_code=304, headers=headers)  # `status` is shadowed by the query param here
+    if fast:
+        return await task_list_response(db, tasks, headers)
+    response.headers.update(headers)
+    return await to_task_reads_async(db, tasks)
+
+@router.get("/todos/search", response_model=List[TaskRead])
+async def search_tasks(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+):
+    q = q.strip()
+    if not q:
+        raise HTTPException(400, "Search query is blank")  # FTS5 rejects an empty MATCH
+    # Ranked full-text match on title/description (GIN tsvector on Postgres, FTS5 on SQLite)
+    if settings.search_mode == "like":
+        stmt = like_search_statement(q, limit, offset)
+    else:
+        stmt = search_statement(engine.dialect.name, q, limit, offset)
+    fast = fast_json_enabled()
+    rows = (await db.execute(task_columns(stmt)) if fast else await db.scalars(stmt)).all()
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Offset"] = str(offset + limit)
+    if fast:
+        return await task_list_response(db, rows, headers)
+    response.headers.update(headers)
+    return await to_task_reads_async(db, rows)
+
+def _export_ndjson(status: Optional[dbm.TaskStatus], assignee_id: Optional[UUID], tag_id: Optional[UUID]):
+    # Own session: the generator outlives the request-scoped get_db dependency
+    db = SessionLocal()
+    try:
+        q = filter_tasks(db.query(dbm.Task), status, assignee_id, tag_id)
+        # yield_per => server-side cursor (stream_results); only one chunk of ORM rows is alive at a time
+        q = q.order_by(dbm.Task.created_at.desc(), dbm.Task.id.desc()).yield_per(EXPORT_CHUNK_SIZE)
+        chunk: List[dbm.Task] = []
+        for t in q:
+            chunk.append(t)
+            if len(chunk) == EXPORT_CHUNK_SIZE:
+                yield "".join(r.model_dump_json() + "\n" for r in to_task_reads(db, chunk))
+                chunk = []
+        if chunk:
+            yield "".join(r.model_dump_json() + "\n" for r in to_task_reads(db, chunk))
+    finally:
+        db.close()
+
+@router.get("/todos/export")
+def export_tasks(
+    format: str = Query("ndjson", description="Only 'ndjson' is supported"),
+    status: Optional[str] = Query(None),
+    assignee_id: Optional[UUID] = Query(None),
+    tag_id: Optional[UUID] = Query(None),
+):
+    # Streams every matching task as one JSON object per line; memory stays flat regardless of row count
+    if format != "ndjson":
+        raise HTTPException(400, "Unsupported export format")
+    status_enum = parse_status(status)  # validate before the stream starts
+    return StreamingResponse(
+        _export_ndjson(status_enum, assignee_id, tag_id),
+        media_type="application/x-ndjson",
+    )
+
+# ---------- Bulk endpoints ----------
+# One request, one transaction: every referenced user/tag ID is validated with a single
+# query, rows are written with executemany, and there is one commit for the whole batch.
+# Invalid items are reported per index and skipped; the valid ones are still applied.
+# A task ID that appears more than once is ambiguous and rejected at every occurrence.
+
+def _check_bulk_size(n: int):
+    if n > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ITEMS} items per bulk request")
+
+def _duplicated(ids) -> set:
+    return {t_id for t_id, n in Counter(ids).items() if n > 1}
+
+def _bulk_result(results: List[BulkItemResult]) -> BulkResult:
+    ok = sum(1 for r in results if r.ok)
+    return BulkResult(succeeded=ok, failed=len(results) - ok, results=results)
+
+@router.post("/todos/bulk", response_model=BulkResult)
+async def bulk_create_tasks(payload: TaskBulkCreate, db: AsyncSession = Depends(get_db)):
+    _check_bulk_size(len(payload.items))
+    users, tags = await _existing_refs(
+        db,
+        {i.created_by for i in payload.items} | {u for i in payload.items for u in i.assignee_ids},
+        {t for i in payload.items for t in i.tag_ids},
+    )
+
+    results: List[BulkItemResult] = []
+    task_rows, assignee_rows, tag_rows = [], [], []
+    for index, item in enumerate(payload.items):
         try:
-            q = q.filter(dbm.Task.status == dbm.TaskStatus(status))
+            status_enum = dbm.TaskStatus(item.status) if item.status else dbm.TaskStatus.todo
+            priority_enum = dbm.TaskPriority(item.priority) if item.priority else dbm.TaskPriority.normal
         except ValueError:
-            raise HTTPException(400, "Invalid status")
-    if assignee_id:
-        q = q.join(dbm.Task.assignees).filter(dbm.User.id == assignee_id)
-    if tag_id:
-        q = q.join(dbm.Task.tags).filter(dbm.Tag.id == tag_id)
+            results.append(BulkItemResult(index=index, ok=False, error="Invalid status or priority"))
+            continue
+        if item.created_by not in users:
+            results.append(BulkItemResult(index=index, ok=False, error="created_by is invalid"))
+            continue
+        if not set(item.assignee_ids) <= users:
+            results.append(BulkItemResult(index=index, ok=False, error="One or more assignee_ids are invalid"))
+            continue
+        if not set(item.tag_ids) <= tags:
+            results.append(BulkItemResult(index=index, ok=False, error="One or more tag_ids are invalid"))
+            continue
 
-    tasks = q.order_by(dbm.Task.created_at.desc()).all()
-    return [to_task_read(t) for t in tasks]
+        task_id = uuid4()
+        task_rows.append({
+            "id": task_id,
+            "title": item.title,
+            "description": item.description,
+            "status": status_enum,
+            "priority": priority_enum,
+            "due_at": item.due_at,
+            "created_by": item.created_by,
+        })
+        assignee_rows += [{"task_id": task_id, "user_id": u} for u in set(item.assignee_ids)]
+        tag_rows += [{"task_id": task_id, "tag_id": t} for t in set(item.tag_ids)]
+        results.append(BulkItemResult(index=index, id=task_id, ok=True))
+
+    # executemany per table, single commit
+    async with _refs_still_exist(db, users, tags):
+        if task_rows:
+            await db.execute(insert(dbm.Task), task_rows)
+        if assignee_rows:
+            await db.execute(insert(dbm.TaskAssignee), assignee_rows)
+        if tag_rows:
+            await db.execute(insert(dbm.TaskTag), tag_rows)
+        await db.commit()
+    return _bulk_result(results)
+
+@router.patch("/todos/bulk", response_model=BulkResult)
+async def bulk_patch_tasks(payload: TaskBulkUpdate, db: AsyncSession = Depends(get_db)):
+    _check_bulk_size(len(payload.items))
+    ids = {i.id for i in payload.items}
+    # The same task twice would write its link rows twice (PK violation for the whole batch)
+    duplicated = _duplicated(i.id for i in payload.items)
+    current = {
+        t_id: completed_at
+        for t_id, completed_at in (await db.execute(
+            select(dbm.Task.id, dbm.Task.completed_at).where(dbm.Task.id.in_(ids))
+        )).all()
+    }
+    users, tags = await _existing_refs(
+        db,
+        {u for i in payload.items for u in (i.assignee_ids or [])},
+        {t for i in payload.items for t in (i.tag_ids or [])},
+    )
+
+    results: List[BulkItemResult] = []
+    now = datetime.now(timezone.utc)  # updated_at doubles as the ETag version
+    updates, assignee_rows, tag_rows = [], [], []
+    replace_assignees, replace_tags = set(), set()
+    for index, item in enumerate(payload.items):
+        if item.id in duplicated:
+            results.append(BulkItemResult(index=index, id=item.id, ok=False, error=DUPLICATE_ID_ERROR))
+            continue
+        if item.id not in current:
+            results.append(BulkItemResult(index=index, id=item.id, ok=False, error="Task not found"))
+            continue
+        values = {}
+        # Same rules as patch_task: None = no change
+        for field in ("title", "description", "due_at"):
+            if getattr(item, field) is not None:
+                values[field] = getattr(item, field)
+        try:
+            if item.status is not None:
+                values["status"] = dbm.TaskStatus(item.status)
+                if values["status"] == dbm.TaskStatus.done:
+                    values["completed_at"] = current[item.id] or datetime.now(timezone.utc)
+                else:
+                    values["completed_at"] = None
+            if item.priority is not None:
+                values["priority"] = dbm.TaskPriority(item.priority)
+        except ValueError:
+            results.append(BulkItemResult(index=index, id=item.id, ok=False, error="Invalid status or priority"))
+            continue
+        if item.assignee_ids is not None and not set(item.assignee_ids) <= users:
+            results.append(BulkItemResult(index=index, id=item.id, ok=False, error="One or more assignee_ids are invalid"))
+            continue
+        if item.tag_ids is not None and not set(item.tag_ids) <= tags:
+            results.append(BulkItemResult(index=index, id=item.id, ok=False, error="One or more tag_ids are invalid"))
+            continue
+
+        if values or item.assignee_ids is not None or item.tag_ids is not None:
+            updates.append({"id": item.id, "updated_at": now, **values})
+        if item.assignee_ids is not None:
+            replace_assignees.add(item.id)
+            assignee_rows += [{"task_id": item.id, "user_id": u} for u in set(item.assignee_ids)]
+        if item.tag_ids is not None:
+            replace_tags.add(item.id)
+            tag_rows += [{"task_id": item.id, "tag_id": t} for t in set(item.tag_ids)]
+        results.append(BulkItemResult(index=index, id=item.id, ok=True))
+
+    async with _refs_still_exist(db, users, tags):
+        # ORM bulk UPDATE by primary key (executemany, grouped by the set of keys present)
+        if updates:
+            await db.execute(update(dbm.Task), updates)
+        # Link tables are replaced wholesale for the tasks that sent a list
+        if replace_assignees:
+            await db.execute(delete(dbm.TaskAssignee).where(dbm.TaskAssignee.task_id.in_(replace_assignees)))
+        if assignee_rows:
+            await db.execute(insert(dbm.TaskAssignee), assignee_rows)
+        if replace_tags:
+            await db.execute(delete(dbm.TaskTag).where(dbm.TaskTag.task_id.in_(replace_tags)))
+        if tag_rows:
+            await db.execute(insert(dbm.TaskTag), tag_rows)
+        await db.commit()
+    return _bulk_result(results)
+
+@router.delete("/todos/bulk", response_model=BulkResult)
+async def bulk_delete_tasks(payload: TaskBulkDelete, db: AsyncSession = Depends(get_db)):
+    _check_bulk_size(len(payload.ids))
+    duplicated = _duplicated(payload.ids)
+    wanted = set(payload.ids) - duplicated
+    found = set((await db.scalars(select(dbm.Task.id).where(dbm.Task.id.in_(wanted)))).all()) if wanted else set()
+    if found:
+        # Queue the attachment objects first, then remove the child rows explicitly: ON DELETE
+        # CASCADE is not enforced on SQLite (no PRAGMA foreign_keys), and the ORM delete path
+        # removes them itself too
+        await release_task_objects(db, found)
+        for child in (dbm.Attachment, dbm.TaskAssignee, dbm.TaskTag):
+            await db.execute(
+                delete(child).where(child.task_id.in_(found)).execution_options(synchronize_session=False)
+            )
+        await db.execute(
+            delete(dbm.Task).where(dbm.Task.id.in_(found)).execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    results = []
+    for index, task_id in enumerate(payload.ids):
+        if task_id in duplicated:
+            results.append(BulkItemResult(index=index, id=task_id, ok=False, error=DUPLICATE_ID_ERROR))
+        else:
+            ok = task_id in found
+            results.append(BulkItemResult(index=index, id=task_id, ok=ok, error=None if ok else "Task not found"))
+    return _bulk_result(results)
 
 @router.get("/todos/{task_id}", response_model=TaskRead)
-def get_task(task_id: UUID, db: Session = Depends(get_session)):
-    t = db.get(dbm.Task, task_id)
+async def get_task(task_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    t = await db.get(dbm.Task, task_id)
     if not t:
         raise HTTPException(status_code=404, detail="Task not found")
-    return to_task_read(t)
+    headers = _cache_headers(t)
+    if not_modified(request, headers["ETag"], t.updated_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return (await to_task_reads_async(db, [t]))[0]
 
 @router.post("/todos/", response_model=TaskRead, status_code=status.HTTP_201_CREATED)
-def create_task(payload: TaskCreate, db: Session = Depends(get_session)):
+async def create_task(payload: TaskCreate, db: AsyncSession = Depends(get_db)):
     # Validate/convert enums
     try:
         status_enum = dbm.TaskStatus(payload.status) if payload.status else dbm.TaskStatus.todo
@@ -70,7 +490,16 @@ def create_task(payload: TaskCreate, db: Session = Depends(get_session)):
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid status or priority")
 
+    # Assignees / Tags (existence checks go through the lookup cache)
+    assignee_ids, tag_ids = set(payload.assignee_ids), set(payload.tag_ids)
+    users, tags = await _existing_refs(db, assignee_ids, tag_ids)
+    if len(users) != len(assignee_ids):
+        raise HTTPException(status_code=400, detail="One or more assignee_ids are invalid")
+    if len(tags) != len(tag_ids):
+        raise HTTPException(status_code=400, detail="One or more tag_ids are invalid")
+
     t = dbm.Task(
+        id=uuid4(),
         title=payload.title,
         description=payload.description,
         status=status_enum,
@@ -78,31 +507,30 @@ def create_task(payload: TaskCreate, db: Session = Depends(get_session)):
         due_at=payload.due_at,
         created_by=payload.created_by,
     )
-
-    # Assignees
-    if payload.assignee_ids:
-        users = db.query(dbm.User).filter(dbm.User.id.in_(payload.assignee_ids)).all()
-        if len(users) != len(set(payload.assignee_ids)):
-            raise HTTPException(status_code=400, detail="One or more assignee_ids are invalid")
-        t.assignees = users
-
-    # Tags
-    if payload.tag_ids:
-        tags = db.query(dbm.Tag).filter(dbm.Tag.id.in_(payload.tag_ids)).all()
-        if len(tags) != len(set(payload.tag_ids)):
-            raise HTTPException(status_code=400, detail="One or more tag_ids are invalid")
-        t.tags = tags
-
     db.add(t)
-    db.commit()
-    db.refresh(t)
-    return to_task_read(t)
+    # Link rows by ID - no need to load User/Tag objects
+    db.add_all([dbm.TaskAssignee(task_id=t.id, user_id=u) for u in assignee_ids])
+    db.add_all([dbm.TaskTag(task_id=t.id, tag_id=tag) for tag in tag_ids])
+    async with _refs_still_exist(db, users, tags):
+        await db.commit()
+    await db.refresh(t)
+    return (await to_task_reads_async(db, [t]))[0]
 
 @router.patch("/todos/{task_id}", response_model=TaskRead)
-def patch_task(task_id: UUID, payload: TaskUpdate, db: Session = Depends(get_session)):
-    t = db.get(dbm.Task, task_id)
+async def patch_task(
+    task_id: UUID,
+    payload: TaskUpdate,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+):
+    t = await db.get(dbm.Task, task_id)
     if not t:
         raise HTTPException(status_code=404, detail="Task not found")
+    # Optimistic concurrency: If-Match must carry the ETag the client last saw
+    if if_match_fails(request, task_etag(t)):
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Task was modified; re-fetch and retry")
+    seen_updated_at = t.updated_at
 
     # simple fields
     if payload.title is not None:
@@ -138,39 +566,47 @@ def patch_task(task_id: UUID, payload: TaskUpdate, db: Session = Depends(get_ses
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid priority")
 
-    # Replace assignees if provided (None = no change, [] = clear)
+    # Replace assignees/tags if provided (None = no change, [] = clear)
+    users, tags = await _existing_refs(db, set(payload.assignee_ids or []), set(payload.tag_ids or []))
+    if payload.assignee_ids and len(users) != len(set(payload.assignee_ids)):
+        raise HTTPException(status_code=400, detail="One or more assignee_ids are invalid")
+    if payload.tag_ids and len(tags) != len(set(payload.tag_ids)):
+        raise HTTPException(status_code=400, detail="One or more tag_ids are invalid")
     if payload.assignee_ids is not None:
-        users = (
-            db.query(dbm.User)
-              .filter(dbm.User.id.in_(payload.assignee_ids))
-              .all()
-            if payload.assignee_ids else []
-        )
-        if payload.assignee_ids and len(users) != len(set(payload.assignee_ids)):
-            raise HTTPException(status_code=400, detail="One or more assignee_ids are invalid")
-        t.assignees = users
-
-    # Replace tags if provided (None = no change, [] = clear)
+        await db.execute(delete(dbm.TaskAssignee).where(dbm.TaskAssignee.task_id == t.id))
+        db.add_all([dbm.TaskAssignee(task_id=t.id, user_id=u) for u in users])
     if payload.tag_ids is not None:
-        tags = (
-            db.query(dbm.Tag)
-              .filter(dbm.Tag.id.in_(payload.tag_ids))
-              .all()
-            if payload.tag_ids else []
+        await db.execute(delete(dbm.TaskTag).where(dbm.TaskTag.task_id == t.id))
+        db.add_all([dbm.TaskTag(task_id=t.id, tag_id=tag) for tag in tags])
+
+    # Bump the version. With If-Match, do it as a compare-and-set so a write that
+    # landed after our read (but before this commit) still fails with 412.
+    now = datetime.now(timezone.utc)
+    if request.headers.get("if-match"):
+        claimed = await db.execute(
+            update(dbm.Task)
+            .where(dbm.Task.id == t.id, dbm.Task.updated_at == seen_updated_at)
+            .values(updated_at=now)
+            .execution_options(synchronize_session=False)
         )
-        if payload.tag_ids and len(tags) != len(set(payload.tag_ids)):
-            raise HTTPException(status_code=400, detail="One or more tag_ids are invalid")
-        t.tags = tags
+        if claimed.rowcount != 1:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Task was modified; re-fetch and retry")
+    t.updated_at = now
 
-    db.commit()
-    db.refresh(t)
-    return to_task_read(t)
+    async with _refs_still_exist(db, users, tags):
+        await db.commit()
+    await db.refresh(t)
+    response.headers.update(_cache_headers(t))
+    return (await to_task_reads_async(db, [t]))[0]
 
 @router.delete("/todos/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(task_id: UUID, db: Session = Depends(get_session)):
-    t = db.get(dbm.Task, task_id)
+async def delete_task(task_id: UUID, db: AsyncSession = Depends(get_db)):
+    t = await db.get(dbm.Task, task_id)
     if not t:
         raise HTTPException(status_code=404, detail="Task not found")
-    db.delete(t)
-    db.commit()
+    # Attachment rows cascade with the task; their storage objects go through the outbox
+    await release_task_objects(db, [task_id])
+    await db.delete(t)
+    await db.commit()
     return
\ No newline at end of file
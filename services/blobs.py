@@ -0,0 +1,78 @@
+# services/blobs.py
+"""
+Content-addressed attachment storage.
+
+Every distinct file body is stored once, under `blob_key(sha256)`, and described by one
+`blobs` row whose `ref_count` is the number of attachments pointing at it:
+    • upload with a hash we already have -> new attachment row, ref_count + 1, no new object
+    • delete an attachment -> ref_count - 1; the object goes only when the count reaches 0
+      (queued on the deletion outbox; a blob picked up again before the worker runs is kept)
+
+Counts move with single UPDATE ... SET ref_count = ref_count ± 1 statements, so concurrent
+uploads/deletes of the same content serialize on the row lock instead of losing updates.
+"""
+
+from typing import Optional, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app_db import models as dbm
+from app_db.database import engine
+from core.config import settings
+
+
+MAX_ACQUIRE_ATTEMPTS = 3
+
+
+def blob_key(sha256: str) -> str:
+    # Two-level fan-out keeps directory listings / S3 prefixes small
+    return f"{settings.aws_s3_prefix}blobs/{sha256[:2]}/{sha256}"
+
+
+def _insert_if_missing(sha256: str, size_bytes: Optional[int]):
+    values = dict(sha256=sha256, storage_key=blob_key(sha256), size_bytes=size_bytes, ref_count=0)
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        return pg_insert(dbm.Blob).values(**values).on_conflict_do_nothing(index_elements=["sha256"])
+    if dialect == "sqlite":
+        return sqlite_insert(dbm.Blob).values(**values).on_conflict_do_nothing(index_elements=["sha256"])
+    return insert(dbm.Blob).values(**values)
+
+
+async def acquire_blob(db, sha256: str, size_bytes: Optional[int]) -> Tuple[str, bool]:
+    """
+    Take a reference on the blob for `sha256`, creating its row if needed.
+    Returns (storage_key, created); `created` means the caller must put the object in place.
+    Runs in the caller's transaction - commit together with the attachment row.
+    """
+    for _ in range(MAX_ACQUIRE_ATTEMPTS):
+        created = (await db.execute(_insert_if_missing(sha256, size_bytes))).rowcount == 1
+        bumped = await db.execute(
+            update(dbm.Blob)
+            .where(dbm.Blob.sha256 == sha256)
+            .values(ref_count=dbm.Blob.ref_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if bumped.rowcount == 1:
+            return blob_key(sha256), created
+        # The deletion worker removed the unreferenced row (and its object) while we waited on
+        # its lock: insert it again, which makes us the one to upload the object
+    raise RuntimeError(f"blob {sha256} kept disappearing while being acquired")
+
+
+async def release_blob(db, sha256: str) -> Optional[str]:
+    """
+    Drop one reference. Returns the storage key when that was the last one, else None.
+    The row stays (ref_count 0) - attachment rows may still point at it until the caller's
+    delete is flushed; the deletion worker removes object and row together (services.outbox).
+    """
+    await db.execute(
+        update(dbm.Blob)
+        .where(dbm.Blob.sha256 == sha256)
+        .values(ref_count=dbm.Blob.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    remaining = await db.scalar(select(dbm.Blob.ref_count).where(dbm.Blob.sha256 == sha256))
+    return blob_key(sha256) if remaining is not None and remaining <= 0 else None
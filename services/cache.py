@@ -0,0 +1,124 @@
+# services/cache.py
+"""
+Small in-process cache: LRU-bounded, per-entry TTL, explicit invalidation, hit/miss counters.
+
+`presign_cache` holds presigned download URLs per storage key until shortly before they
+expire (see services.storage.presigned_download).
+
+`lookup_cache` fronts the user/tag lookups (GET /users, GET /tags) and the per-ID
+existence checks done when tasks are created/patched. It is per process, so:
+    • writes made through the ORM in this process invalidate immediately (mapper events below)
+    • writes from elsewhere (other replicas, data_db.py) show up after at most the TTL
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from sqlalchemy import event
+
+from core.config import settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+lookup_cache = TTLCache(maxsize=settings.lookup_cache_max_entries, ttl=settings.lookup_cache_ttl_seconds)
+
+# URLs are inserted with their own TTL (presign lifetime minus a safety margin)
+presign_cache = TTLCache(maxsize=settings.presign_cache_max_entries, ttl=settings.presigned_expires_seconds)
+
+# Keys
+USERS_LIST = ("users", "list")
+TAGS_LIST = ("tags", "list")
+
+def user_key(user_id) -> tuple:
+    return ("user", user_id)
+
+def tag_key(tag_id) -> tuple:
+    return ("tag", tag_id)
+
+
+def download_key(storage_key: str) -> tuple:
+    return ("download", storage_key)
+
+def invalidate_lookups() -> None:
+    """Drop every cached user/tag entry (e.g. after an out-of-band import)."""
+    lookup_cache.clear()
+
+
+# ---------- Invalidation on ORM writes ----------
+
+def _register_invalidation():
+    from app_db import models as dbm
+
+    def _user_changed(mapper, connection, target):
+        lookup_cache.invalidate(USERS_LIST, user_key(target.id))
+
+    def _tag_changed(mapper, connection, target):
+        lookup_cache.invalidate(TAGS_LIST, tag_key(target.id))
+
+    for op in ("after_insert", "after_update", "after_delete"):
+        event.listen(dbm.User, op, _user_changed)
+        event.listen(dbm.Tag, op, _tag_changed)
+
+_register_invalidation()
@@ -0,0 +1,158 @@
+# services/outbox.py
+"""
+Storage deletion outbox.
+
+Request handlers never delete objects themselves. When a row stops referencing an object
+(attachment deleted, task deleted, last reference to a blob released), the handler inserts a
+`storage_deletions` row in the same transaction - so an object is queued for deletion exactly
+when the DB change that orphans it commits, and never otherwise.
+
+A background loop (started from main.py) drains due rows in batches of up to 1000 keys with one
+DeleteObjects call per batch. Failed keys are retried with exponential backoff; after
+STORAGE_DELETION_MAX_ATTEMPTS they stay in the table (attempts + last_error) for inspection.
+Several replicas can drain concurrently: rows are claimed with FOR UPDATE SKIP LOCKED on Postgres.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import delete, exists, select
+from starlette.concurrency import run_in_threadpool
+
+from app_db import models as dbm
+from app_db.database import SessionLocal
+from core.config import settings
+from services.blobs import release_blob
+from services.cache import presign_cache, download_key
+from services.storage import get_storage
+from services.thumbnails import preview_key
+
+MAX_BATCH = 1000  # S3 DeleteObjects limit
+MAX_RETRY_SECONDS = 3600
+
+
+# ---------- Request side: enqueue in the caller's transaction ----------
+
+def enqueue_deletion(db, storage_key: str) -> None:
+    db.add(dbm.StorageDeletion(storage_key=storage_key))
+    presign_cache.invalidate(download_key(storage_key))
+
+
+async def release_object(db, storage_key: str, blob_sha256: Optional[str]) -> Optional[str]:
+    """Drop one attachment's claim on its object; queues the object if nothing else uses it."""
+    orphan_key = await release_blob(db, blob_sha256) if blob_sha256 else storage_key
+    if orphan_key:
+        enqueue_deletion(db, orphan_key)
+    return orphan_key
+
+
+async def release_task_objects(db, task_ids: Iterable) -> None:
+    """Release the objects of every attachment of these tasks (call before deleting the tasks)."""
+    q = (
+        select(dbm.Attachment.storage_key, dbm.Attachment.blob_sha256)
+        .where(dbm.Attachment.task_id.in_(list(task_ids)))
+    )
+    for storage_key, blob_sha256 in (await db.execute(q)).all():
+        await release_object(db, storage_key, blob_sha256)
+
+
+# ---------- Worker side ----------
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(settings.storage_deletion_retry_seconds * 2 ** (attempts - 1), MAX_RETRY_SECONDS))
+
+
+def drain_once(batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Claim one batch of due rows and delete their objects. Blocking; run it in a thread."""
+    batch_size = min(batch_size or settings.storage_deletion_batch_size, MAX_BATCH)
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        rows = db.scalars(
+            select(dbm.StorageDeletion)
+            .where(
+                dbm.StorageDeletion.next_attempt_at <= now,
+                dbm.StorageDeletion.attempts < settings.storage_deletion_max_attempts,
+            )
+            .order_by(dbm.StorageDeletion.next_attempt_at, dbm.StorageDeletion.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            return {"claimed": 0, "deleted": 0, "failed": 0}
+
+        keys = {r.storage_key for r in rows}
+        # Content-addressed keys can come back to life (same bytes uploaded again after the last
+        # reference went away), so liveness is settled under lock and held until commit:
+        #   • the blob rows behind these keys are locked FOR UPDATE - acquire_blob's ref_count
+        #     UPDATE and the FK check of a new attachment on that blob both wait for us;
+        #   • unreferenced blob rows are deleted first, so a waiting acquire_blob re-creates the
+        #     row after we commit and uploads the object again instead of trusting a deleted one.
+        # On SQLite the DELETE takes the database write lock, which serializes the same way.
+        db.execute(select(dbm.Blob.sha256).where(dbm.Blob.storage_key.in_(keys)).with_for_update()).all()
+        db.execute(
+            delete(dbm.Blob)
+            .where(
+                dbm.Blob.storage_key.in_(keys),
+                dbm.Blob.ref_count <= 0,
+                ~exists().where(dbm.Attachment.blob_sha256 == dbm.Blob.sha256),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        live = set(db.scalars(select(dbm.Blob.storage_key).where(dbm.Blob.storage_key.in_(keys))))
+        # Attachments only share a key through a blob (covered above); lock the rows that still
+        # point at a key anyway so none is repointed or removed mid-drain
+        live |= set(db.scalars(
+            select(dbm.Attachment.storage_key)
+            .where(dbm.Attachment.storage_key.in_(keys))
+            .with_for_update(read=True)
+        ))
+        to_delete = sorted(keys - live)
+
+        # Derived previews live and die with their source object
+        previews = [preview_key(k) for k in to_delete]
+        try:
+            errors = get_storage().delete_objects(to_delete + previews) if to_delete else {}
+        except Exception as e:  # whole request failed (network, credentials): retry every key
+            errors = {k: repr(e) for k in to_delete}
+        # A missing preview is no reason to retry. A failed key keeps its outbox row; its blob
+        # row is already gone, so the retry deletes it unless the content was uploaded again.
+        failed = {k: errors[k] for k in to_delete if k in errors}
+        gone = [k for k in to_delete if k not in failed]
+        for r in rows:
+            error = failed.get(r.storage_key)
+            if error is None:
+                db.delete(r)
+            else:
+                r.attempts += 1
+                r.last_error = error[:2000]
+                r.next_attempt_at = now + _retry_delay(r.attempts)
+        db.commit()
+        return {"claimed": len(rows), "deleted": len(gone), "failed": len(failed)}
+
+
+async def run_worker(stop: asyncio.Event) -> None:
+    """Drain until `stop` is set; back-to-back while batches come back full, else poll."""
+    batch_size = min(settings.storage_deletion_batch_size, MAX_BATCH)
+    while not stop.is_set():
+        try:
+            result = await run_in_threadpool(drain_once, batch_size)
+        except Exception as e:
+            print(f"[outbox] drain failed: {e!r}")
+            result = None
+        if result and result["claimed"] == batch_size:
+            continue
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.storage_deletion_poll_seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+if __name__ == "__main__":
+    # One-shot drain for cron / scheduled Lambda (set STORAGE_DELETION_WORKER=false there)
+    total = 0
+    while (result := drain_once())["claimed"]:
+        total += result["deleted"]
+        if result["claimed"] < min(settings.storage_deletion_batch_size, MAX_BATCH):
+            break
+    print(f"[outbox] deleted {total} objects")
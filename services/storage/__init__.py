@@ -1,9 +1,50 @@
 # services/storage/__init__.py
+import threading
+import time
+from typing import Tuple
 from core.config import settings
+from services.cache import presign_cache, download_key
 from .s3 import S3Storage
-from .local import LocalStorage
+from .local import LocalStorage, UploadTooLarge
+
+# Process-wide registry: one storage object per backend, created on first use.
+# Building an S3Storage means a boto3 client (credential chain, endpoint resolution,
+# HTTP pool) - far too slow to redo per request. boto3 clients are thread-safe, so
+# the threadpool workers and the event loop can all share one.
+_instances = {}
+_lock = threading.Lock()
 
 def get_storage():
     backend = "s3" if settings.storage_backend == "s3" else "local"
-    print(f"[storage] using backend: {backend}")
-    return S3Storage() if settings.storage_backend == "s3" else LocalStorage()
\ No newline at end of file
+    storage = _instances.get(backend)
+    if storage is None:
+        with _lock:
+            storage = _instances.get(backend)  # double-checked: another thread may have won
+            if storage is None:
+                storage = S3Storage() if backend == "s3" else LocalStorage()
+                _instances[backend] = storage
+                print(f"[storage] using backend: {backend}")
+    return storage
+
+def reset_storage():
+    """Drop cached instances (after changing settings, or between tests)."""
+    with _lock:
+        _instances.clear()
+
+def presigned_download(key: str) -> Tuple[str, int]:
+    """
+    (url, seconds it stays valid) for `key`, reusing a previously signed URL while it has
+    more than presign_cache_margin_seconds left - repeat views skip the signing work.
+    """
+    cached = presign_cache.get(download_key(key))
+    now = time.monotonic()
+    if cached is not None:
+        url, expires_at = cached
+        return url, int(expires_at - now)
+    lifetime = settings.presigned_expires_seconds
+    url = get_storage().presign_download(key, lifetime)
+    ttl = lifetime - settings.presign_cache_margin_seconds
+    if ttl > 0:
+        presign_cache.set(download_key(key), (url, now + lifetime), ttl=ttl)
+    return url, lifetime
+
@@ -1,36 +1,215 @@
 # services/storage/local.py
+"""
+Filesystem backend (dev, single box, or a volume shared by several pods).
+
+Layout: LOCAL_STORAGE_DIR/{h[0:2]}/{h[2:4]}/{key}, h = sha256(key). The two hashed levels
+spread files over 65,536 directories so none of them grows huge, and the full key (task
+prefix included) is kept below them. Files written by older versions sit flat as
+LOCAL_STORAGE_DIR/{basename(key)}; reads and deletes fall back to that location until
+`python -m services.storage.migrate_local` has moved them. Scratch keys from temp_key() skip
+sharding and live flat in LOCAL_STORAGE_DIR/.tmp/, so short-lived uploads don't leave empty
+directory chains behind in random shards.
+
+Every filesystem call runs in the threadpool; the event loop only awaits. Writes go to a
+uniquely named .part file and are renamed into place, so concurrent writers on a shared
+volume never expose half-written files.
+"""
+import hashlib
 import os
 import shutil
-from typing import Optional, Dict, Tuple
+import uuid
+from typing import Optional, Dict, List, Tuple
 from urllib.parse import quote
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
 from core.config import settings
 
+TMP_PREFIX = ".tmp/"
+
+class UploadTooLarge(Exception):
+    """Raised by LocalStorage.save_stream once an upload passes the size limit."""
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
 class LocalStorage:
     def __init__(self):
-        os.makedirs(settings.local_storage_dir, exist_ok=True)
+        self.root = os.path.abspath(settings.local_storage_dir)
+        os.makedirs(self.root, exist_ok=True)
+
+    # ---------- key -> path (pure, no IO) ----------
+
+    def temp_key(self, suffix: str = "") -> str:
+        return f"{TMP_PREFIX}{uuid.uuid4().hex}{suffix}"
+
+    def shard_path(self, key: str) -> str:
+        if key.startswith(TMP_PREFIX):
+            name = key[len(TMP_PREFIX):]
+            if not name or "/" in name or name in (".", ".."):
+                raise ValueError(f"invalid storage key: {key!r}")
+            return os.path.join(self.root, TMP_PREFIX.rstrip("/"), name)
+        parts = [p for p in key.split("/") if p]
+        if not parts or any(p in (".", "..") for p in parts):
+            raise ValueError(f"invalid storage key: {key!r}")
+        h = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.root, h[:2], h[2:4], *parts)
+
+    def legacy_path(self, key: str) -> str:
+        return os.path.join(self.root, key.split("/")[-1])
+
+    def _existing_path(self, key: str) -> Optional[str]:
+        for path in (self.shard_path(key), self.legacy_path(key)):
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def _delete_sync(self, key: str) -> None:
+        _remove_quietly(self.shard_path(key))
+        _remove_quietly(self.legacy_path(key))
+
+    def _move_sync(self, src_key: str, dst_key: str) -> None:
+        src = self._existing_path(src_key)
+        if src is None:
+            raise FileNotFoundError(src_key)
+        dst = self.shard_path(dst_key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        os.replace(src, dst)  # atomic on the same filesystem
+
+    def _copy_sync(self, src_key: str, dst_key: str) -> None:
+        src = self._existing_path(src_key)
+        if src is None:
+            raise FileNotFoundError(src_key)
+        dst = self.shard_path(dst_key)
+        tmp_path = f"{dst}.{uuid.uuid4().hex}.part"
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, dst)  # readers never see a half-written copy
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
 
-    def presign_upload(self, key: str, content_type: Optional[str], expires: int) -> Tuple[str, Dict]:
+    # ---------- async API ----------
+
+    def presign_upload(self, key: str, content_type: Optional[str], expires: int,
+                       sha256: Optional[str] = None) -> Tuple[str, Dict]:
         # Not used directly; we’ll accept the bytes via API in local mode.
         return "", {}
 
-    def save_file(self, key: str, file: UploadFile) -> str:
-        # Store file under LOCAL_STORAGE_DIR/{basename}
-        basename = key.split("/")[-1]
-        path = os.path.join(settings.local_storage_dir, basename)
-        with open(path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
-        return path
+    async def save_stream(self, key: str, file: UploadFile, max_bytes: int) -> Tuple[str, int, str]:
+        """
+        Copy an upload to the key's sharded path in fixed-size chunks.
+        Returns (path, size_bytes, sha256 hex). Size and hash are computed as the bytes go by;
+        the file is written to a .part file and renamed only once complete, and the copy
+        stops (UploadTooLarge) as soon as max_bytes is exceeded.
+        """
+        path = self.shard_path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
 
-    def presign_download(self, key: str, expires: int) -> str:
-        basename = key.split("/")[-1]
-        path = os.path.join(settings.local_storage_dir, basename)
-        return f"/attachments/local-download?path={quote(path)}"
+        def _open():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            return open(tmp_path, "wb")
 
-    def delete_object(self, key: str) -> None:
-        basename = key.split("/")[-1]
-        path = os.path.join(settings.local_storage_dir, basename)
+        def _write(f, chunk: bytes) -> None:
+            digest.update(chunk)
+            f.write(chunk)
+
+        f = await run_in_threadpool(_open)
         try:
-            os.remove(path)
-        except FileNotFoundError:
-            pass
\ No newline at end of file
+            while chunk := await file.read(settings.upload_chunk_bytes):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                await run_in_threadpool(_write, f, chunk)
+            await run_in_threadpool(f.close)
+            await run_in_threadpool(os.replace, tmp_path, path)
+        except BaseException:
+            await run_in_threadpool(f.close)
+            await run_in_threadpool(_remove_quietly, tmp_path)
+            raise
+        return path, size, digest.hexdigest()
+
+    def presign_download(self, key: str, expires: int) -> str:
+        # local_download falls back to the legacy flat path for unmigrated files
+        return f"/attachments/local-download?path={quote(self.shard_path(key))}"
+
+    async def stat(self, key: str) -> Optional[os.stat_result]:
+        def _stat():
+            path = self._existing_path(key)
+            return _stat_or_none(path) if path else None
+        return await run_in_threadpool(_stat)
+
+    async def object_exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+    async def object_sha256(self, key: str) -> Optional[str]:
+        """Hex SHA-256 of the stored bytes, or None if the object is missing."""
+        def _hash() -> Optional[str]:
+            path = self._existing_path(key)
+            if path is None:
+                return None
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                while chunk := f.read(settings.upload_chunk_bytes):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        return await run_in_threadpool(_hash)
+
+    async def move_object(self, src_key: str, dst_key: str) -> None:
+        await run_in_threadpool(self._move_sync, src_key, dst_key)
+
+    async def copy_object(self, src_key: str, dst_key: str) -> None:
+        await run_in_threadpool(self._copy_sync, src_key, dst_key)
+
+    async def delete_object(self, key: str) -> None:
+        await run_in_threadpool(self._delete_sync, key)
+
+    async def read_object(self, key: str) -> bytes:
+        def _read() -> bytes:
+            path = self._existing_path(key)
+            if path is None:
+                raise FileNotFoundError(key)
+            with open(path, "rb") as f:
+                return f.read()
+        return await run_in_threadpool(_read)
+
+    async def put_object(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        def _put() -> None:
+            path = self.shard_path(key)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        await run_in_threadpool(_put)
+
+    def delete_objects(self, keys: List[str]) -> Dict[str, str]:
+        # Batch delete for the outbox worker, which already runs in a thread
+        failed = {}
+        for key in keys:
+            try:
+                self._delete_sync(key)
+            except OSError as e:
+                failed[key] = str(e)
+        return failed
+
+    def resolve_download_path(self, path: str) -> Optional[str]:
+        """Map a path from presign_download to the file on disk (sharded, else legacy flat)."""
+        path = os.path.abspath(path)
+        if os.path.commonpath([path, self.root]) != self.root:
+            return None
+        if os.path.isfile(path):
+            return path
+        legacy = os.path.join(self.root, os.path.basename(path))
+        return legacy if os.path.isfile(legacy) else None
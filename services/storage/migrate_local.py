@@ -0,0 +1,60 @@
+# services/storage/migrate_local.py
+"""
+Move LocalStorage files from the old flat layout (LOCAL_STORAGE_DIR/{basename}) to the
+sharded one (LOCAL_STORAGE_DIR/{h[0:2]}/{h[2:4]}/{key}).
+
+The flat layout dropped everything but the basename, so the full key can only be recovered
+from the DB: every storage_key in `attachments` and `blobs` is looked up at its legacy path
+and renamed into place. Safe to re-run and to run while the app is serving - reads fall back
+to the legacy path until a file has moved, and each move is a single rename.
+
+Usage:
+    python -m services.storage.migrate_local [--dry-run]
+"""
+
+import argparse
+import os
+
+from sqlalchemy import select, union
+
+from app_db import models as dbm
+from app_db.database import SessionLocal
+from services.storage.local import LocalStorage
+
+
+def storage_keys(db):
+    q = union(select(dbm.Attachment.storage_key), select(dbm.Blob.storage_key))
+    return db.execute(q).scalars()
+
+
+def migrate(dry_run: bool = False) -> dict:
+    storage = LocalStorage()
+    counts = {"moved": 0, "already_sharded": 0, "missing": 0}
+    with SessionLocal() as db:
+        for key in storage_keys(db):
+            src, dst = storage.legacy_path(key), storage.shard_path(key)
+            if os.path.isfile(dst):
+                counts["already_sharded"] += 1
+            elif not os.path.isfile(src):
+                counts["missing"] += 1
+            else:
+                if not dry_run:
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    os.replace(src, dst)
+                counts["moved"] += 1
+    # Whatever stays flat in the root afterwards is not referenced by any row
+    flat = sum(1 for e in os.scandir(storage.root) if e.is_file() and not e.name.endswith(".part"))
+    counts["unreferenced_flat_files"] = flat - counts["moved"] if dry_run else flat
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dry-run", action="store_true", help="report what would move, move nothing")
+    args = parser.parse_args()
+    counts = migrate(dry_run=args.dry_run)
+    print(("[dry run] " if args.dry_run else "") + ", ".join(f"{k}={v}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,48 @@
 # services/storage/s3.py
+import base64
+import hashlib
 import boto3
-from typing import Optional, Dict, Tuple
+from botocore.exceptions import ClientError
+from fastapi.concurrency import run_in_threadpool
+from botocore.config import Config
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Iterable, List, Tuple
 from core.config import settings
 
+# S3 multipart limits
+MIN_PART_BYTES = 5 * 1024 * 1024
+MAX_PARTS = 10_000
+
 class S3Storage:
     def __init__(self):
-        self.client = boto3.client("s3", region_name=settings.aws_region)
+        # Own Session: the boto3 default session is not thread-safe to create clients from
+        session = boto3.session.Session()
+        self.client = session.client(
+            "s3",
+            region_name=settings.aws_region,
+            config=Config(
+                signature_version="s3v4",
+                max_pool_connections=settings.s3_max_pool_connections,
+                connect_timeout=settings.s3_connect_timeout,
+                read_timeout=settings.s3_read_timeout,
+                retries={"max_attempts": settings.s3_max_attempts, "mode": "standard"},
+                tcp_keepalive=True,
+            ),
+        )
         self.bucket = settings.aws_s3_bucket
 
-    def presign_upload(self, key: str, content_type: Optional[str], expires: int) -> Tuple[str, Dict]:
+    def presign_upload(self, key: str, content_type: Optional[str], expires: int,
+                       sha256: Optional[str] = None) -> Tuple[str, Dict]:
         fields = {}
         conditions = []
         if content_type:
             fields["Content-Type"] = content_type
             conditions.append({"Content-Type": content_type})
+        if sha256:
+            # Make S3 reject a body that doesn't hash to the sha256 the client announced
+            checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+            fields["x-amz-checksum-sha256"] = checksum
+            conditions.append({"x-amz-checksum-sha256": checksum})
         resp = self.client.generate_presigned_post(
             Bucket=self.bucket,
             Key=key,
@@ -30,5 +59,110 @@ class S3Storage:
             ExpiresIn=expires,
         )
 
-    def delete_object(self, key: str) -> None:
-        self.client.delete_object(Bucket=self.bucket, Key=key)
\ No newline at end of file
+    async def object_exists(self, key: str) -> bool:
+        def _head() -> bool:
+            try:
+                self.client.head_object(Bucket=self.bucket, Key=key)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                    return False
+                raise
+            return True
+        # boto3 is blocking; keep it off the event loop
+        return await run_in_threadpool(_head)
+
+    async def delete_object(self, key: str) -> None:
+        await run_in_threadpool(self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def object_sha256(self, key: str) -> Optional[str]:
+        """Hex SHA-256 of the stored bytes, or None if the object is missing."""
+        def _hash() -> Optional[str]:
+            try:
+                head = self.client.head_object(Bucket=self.bucket, Key=key, ChecksumMode="ENABLED")
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                    return None
+                raise
+            checksum = head.get("ChecksumSHA256")
+            if checksum and "-" not in checksum:  # "-N": multipart checksum of checksums, not the body's
+                return base64.b64decode(checksum).hex()
+            # Uploaded without a checksum S3 verified: hash the body ourselves
+            digest = hashlib.sha256()
+            body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+            for chunk in body.iter_chunks(settings.upload_chunk_bytes):
+                digest.update(chunk)
+            return digest.hexdigest()
+        return await run_in_threadpool(_hash)
+
+    async def copy_object(self, src_key: str, dst_key: str) -> None:
+        def _copy() -> None:
+            # Managed copy: switches to multipart UploadPartCopy above 5 GB
+            self.client.copy({"Bucket": self.bucket, "Key": src_key}, self.bucket, dst_key)
+        await run_in_threadpool(_copy)
+
+    async def read_object(self, key: str) -> bytes:
+        def _get() -> bytes:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        return await run_in_threadpool(_get)
+
+    async def put_object(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        extra = {"ContentType": content_type} if content_type else {}
+        await run_in_threadpool(self.client.put_object, Bucket=self.bucket, Key=key, Body=data, **extra)
+
+    def delete_objects(self, keys: List[str]) -> Dict[str, str]:
+        """Delete keys with one DeleteObjects request per 1000; returns {key: error} for the ones S3 refused."""
+        failed = {}
+        for i in range(0, len(keys), 1000):
+            resp = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in keys[i:i + 1000]], "Quiet": True},  # Quiet: only errors come back
+            )
+            failed.update({e["Key"]: f"{e.get('Code')}: {e.get('Message')}" for e in resp.get("Errors", [])})
+        return failed
+
+    # ---------- Multipart upload ----------
+
+    def create_multipart_upload(self, key: str, content_type: Optional[str]) -> str:
+        extra = {"ContentType": content_type} if content_type else {}
+        resp = self.client.create_multipart_upload(Bucket=self.bucket, Key=key, **extra)
+        return resp["UploadId"]
+
+    def presign_upload_parts(self, key: str, upload_id: str, part_numbers: Iterable[int],
+                             expires: int) -> List[Tuple[int, str]]:
+        # Presigning is local signing only (no request to S3), so N URLs cost N HMACs
+        return [
+            (n, self.client.generate_presigned_url(
+                ClientMethod="upload_part",
+                Params={"Bucket": self.bucket, "Key": key, "UploadId": upload_id, "PartNumber": n},
+                ExpiresIn=expires,
+            ))
+            for n in part_numbers
+        ]
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: Iterable[Tuple[int, str]]) -> int:
+        """Stitch the uploaded parts together; returns the final object size."""
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": n, "ETag": etag} for n, etag in sorted(parts)]},
+        )
+        return self.client.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> None:
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+
+    def abort_stale_multipart_uploads(self, older_than_seconds: int, prefix: str = "") -> List[Tuple[str, str]]:
+        """
+        Abort in-progress uploads started before the cutoff (their parts are billed until then).
+        Returns the (key, upload_id) pairs aborted, so the caller can drop their pending rows.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than_seconds)
+        aborted = []
+        paginator = self.client.get_paginator("list_multipart_uploads")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for upload in page.get("Uploads", []):
+                if upload["Initiated"] < cutoff:
+                    self.abort_multipart_upload(upload["Key"], upload["UploadId"])
+                    aborted.append((upload["Key"], upload["UploadId"]))
+        return aborted
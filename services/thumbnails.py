@@ -0,0 +1,118 @@
+# services/thumbnails.py
+"""
+Preview images for image attachments.
+
+After an upload lands, the router queues `derive_preview(attachment_id)` as a background task
+(runs after the response is sent). It reads the original from storage, resizes it in a process
+pool - decoding/resampling is CPU-bound and would hold the GIL in a thread - writes a JPEG
+under `preview_key(storage_key)`, and records that key on the attachment row.
+
+Previews are keyed by the source object, so deduplicated attachments share one preview, and
+the deletion outbox removes a preview together with its source object.
+Pillow is optional: without it (or with THUMBNAILS_ENABLED=false) nothing is derived.
+"""
+
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from uuid import UUID
+
+from starlette.concurrency import run_in_threadpool
+
+from app_db import models as dbm
+from app_db.database import SessionLocal
+from core.config import settings
+from services.storage import get_storage
+
+try:
+    import PIL  # noqa: F401  (only checked here; the pool workers import it)
+    HAVE_PILLOW = True
+except ImportError:
+    HAVE_PILLOW = False
+
+PREVIEW_CONTENT_TYPE = "image/jpeg"
+# Formats Pillow decodes out of the box
+PREVIEWABLE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/bmp", "image/tiff"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def preview_key(storage_key: str) -> str:
+    digest = hashlib.sha256(storage_key.encode()).hexdigest()
+    return f"{settings.aws_s3_prefix}previews/{settings.thumbnail_max_px}/{digest}.jpg"
+
+
+def is_previewable(content_type: Optional[str], size_bytes: Optional[int]) -> bool:
+    return (
+        settings.thumbnails_enabled
+        and HAVE_PILLOW
+        and (content_type or "").split(";")[0].strip().lower() in PREVIEWABLE_TYPES
+        and (size_bytes is None or size_bytes <= settings.thumbnail_max_source_bytes)
+    )
+
+
+def make_thumbnail(data: bytes, max_px: int) -> bytes:
+    """Resize to fit max_px x max_px, honouring EXIF orientation. Runs in a pool process."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("RGB", (max_px, max_px))  # JPEG: let the decoder downscale while decoding
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_px, max_px))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=80, optimize=True)
+        return out.getvalue()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.thumbnail_workers)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _load(attachment_id: UUID):
+    with SessionLocal() as db:
+        att = db.get(dbm.Attachment, attachment_id)
+        return None if att is None else (att.storage_key, att.content_type, att.size_bytes, att.preview_key)
+
+
+def _store_key(attachment_id: UUID, key: str) -> None:
+    with SessionLocal() as db:
+        att = db.get(dbm.Attachment, attachment_id)
+        if att is not None:  # deleted while we were resizing
+            att.preview_key = key
+            db.commit()
+
+
+async def derive_preview(attachment_id: UUID) -> None:
+    """Background task: build (or reuse) the preview for one attachment. Never raises."""
+    try:
+        row = await run_in_threadpool(_load, attachment_id)
+        if row is None:
+            return
+        storage_key, content_type, size_bytes, existing = row
+        if existing or not is_previewable(content_type, size_bytes):
+            return
+        key = preview_key(storage_key)
+        storage = get_storage()
+        if not await storage.object_exists(key):  # shared blob: another attachment may have made it
+            data = await storage.read_object(storage_key)
+            thumb = await asyncio.get_running_loop().run_in_executor(
+                _get_pool(), make_thumbnail, data, settings.thumbnail_max_px,
+            )
+            await storage.put_object(key, thumb, PREVIEW_CONTENT_TYPE)
+        await run_in_threadpool(_store_key, attachment_id, key)
+    except Exception as e:  # not an image after all, storage hiccup, ... - no preview, no crash
+        print(f"[thumbnails] {attachment_id}: {e!r}")
@@ -0,0 +1,102 @@
+# tests/conftest.py
+"""
+Tests run against a throwaway SQLite file built with create_all, so no Postgres is needed.
+The models' Postgres `now()` defaults are adapted for SQLite here. Storage is local unless a
+test switches to S3 under moto (see the `s3` fixture).
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timezone
+
+_TMP = tempfile.mkdtemp(prefix="taskapi-tests-")
+# Before anything imports core.config / app_db.database: both read the environment at import
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ["DB_ASYNC"] = "false"
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_DIR"] = os.path.join(_TMP, "files")
+os.environ["AUTO_CREATE_TABLES"] = "false"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import boto3  # noqa: E402
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from moto import mock_aws  # noqa: E402
+from sqlalchemy import event, text  # noqa: E402
+from sqlalchemy.schema import DefaultClause  # noqa: E402
+
+from app_db import models as dbm  # noqa: E402
+from app_db import search  # noqa: E402,F401  (registers the FTS5 table/triggers DDL)
+from app_db.database import Base, SessionLocal, engine  # noqa: E402
+from core.config import settings  # noqa: E402
+from services.storage import reset_storage  # noqa: E402
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_now(dbapi_connection, _record):
+    dbapi_connection.create_function(
+        "now", 0, lambda: datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f"),
+    )
+
+
+def _sqlite_defaults() -> None:
+    # DEFAULT now() is not valid SQLite DDL; DEFAULT (now()) calls the function registered above
+    for table in Base.metadata.tables.values():
+        for column in table.columns:
+            default = column.server_default
+            if default is not None and "now()" in str(getattr(default, "arg", "")):
+                column.server_default = DefaultClause(text("(now())"))
+
+
+_sqlite_defaults()
+Base.metadata.create_all(engine)
+
+import main  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture(scope="session")
+def user_id():
+    with SessionLocal() as db:
+        department = dbm.Department(name="Engineering")
+        db.add(department)
+        db.flush()
+        role = dbm.Role(name="Developer", department_id=department.id)
+        db.add(role)
+        db.flush()
+        user = dbm.User(first_name="Test", email=f"{uuid.uuid4().hex}@example.com",
+                        department_id=department.id, role_id=role.id)
+        db.add(user)
+        db.commit()
+        return str(user.id)
+
+
+@pytest.fixture
+def task_id(client, user_id):
+    response = client.post("/todos/", json={"title": "test task", "created_by": user_id})
+    assert response.status_code in (200, 201), response.text
+    return response.json()["id"]
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """S3 storage backed by moto; yields the boto3 client with the bucket created."""
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    with mock_aws():
+        client = boto3.client("s3", region_name=settings.aws_region)
+        location = {} if settings.aws_region == "us-east-1" else {
+            "CreateBucketConfiguration": {"LocationConstraint": settings.aws_region},
+        }
+        client.create_bucket(Bucket=settings.aws_s3_bucket, **location)
+        monkeypatch.setattr(settings, "storage_backend", "s3")
+        reset_storage()
+        yield client
+        reset_storage()
@@ -0,0 +1,55 @@
+# tests/test_bulk.py
+from uuid import UUID, uuid4
+
+from sqlalchemy import func, select
+
+from app_db import models as dbm
+from app_db.database import SessionLocal
+
+
+def _create_task(client, user_id, tag_id):
+    response = client.post("/todos/", json={
+        "title": "bulk", "created_by": user_id, "assignee_ids": [user_id], "tag_ids": [tag_id],
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+
+def _tag(name):
+    with SessionLocal() as db:
+        tag = dbm.Tag(name=name)
+        db.add(tag)
+        db.commit()
+        return str(tag.id)
+
+
+def _rows(model, task_id):
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).select_from(model).where(model.task_id == UUID(task_id)))
+
+
+def test_bulk_delete_removes_child_rows(client, user_id):
+    task_id = _create_task(client, user_id, _tag("bulk-delete-children"))
+    upload = client.post(f"/attachments/tasks/{task_id}/upload-direct", files={"file": ("a.txt", b"hello")})
+    assert upload.status_code == 200, upload.text
+
+    response = client.request("DELETE", "/todos/bulk", json={"ids": [task_id]})
+    assert response.status_code == 200, response.text
+    assert response.json()["succeeded"] == 1
+    for model in (dbm.Attachment, dbm.TaskAssignee, dbm.TaskTag):
+        assert _rows(model, task_id) == 0, model.__tablename__
+
+
+def test_bulk_delete_rejects_duplicate_ids(client, user_id):
+    tag_id = _tag("bulk-delete-duplicates")
+    twice, once = _create_task(client, user_id, tag_id), _create_task(client, user_id, tag_id)
+    missing = str(uuid4())
+
+    response = client.request("DELETE", "/todos/bulk", json={"ids": [twice, once, twice, missing]})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (1, 3)
+    assert [r["ok"] for r in body["results"]] == [False, True, False, False]
+    assert body["results"][0]["error"] == body["results"][2]["error"] == "Task id appears more than once"
+    assert client.get(f"/todos/{twice}").status_code == 200
+    assert client.get(f"/todos/{once}").status_code == 404
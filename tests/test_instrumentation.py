@@ -0,0 +1,19 @@
+# tests/test_instrumentation.py
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app_db.database import engine
+
+
+def test_failing_statements_leave_no_timing_state_on_the_connection(client):
+    # `client` imports main, which instruments the engine
+    with engine.connect() as conn:
+        for _ in range(5):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.rollback()
+        assert "query_start" not in conn.info
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+        assert "query_start" not in conn.info
+
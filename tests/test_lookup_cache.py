@@ -0,0 +1,47 @@
+# tests/test_lookup_cache.py
+from uuid import UUID
+
+import pytest
+from sqlalchemy import delete, event
+
+from app_db import models as dbm
+from app_db.database import SessionLocal, engine
+
+
+def _enforce_foreign_keys(dbapi_connection, _record):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+@pytest.fixture
+def foreign_keys():
+    # SQLite only checks FKs with the pragma, which is per connection: reconnect with it on
+    event.listen(engine, "connect", _enforce_foreign_keys)
+    engine.dispose()
+    yield
+    event.remove(engine, "connect", _enforce_foreign_keys)
+    engine.dispose()
+
+
+def test_user_deleted_elsewhere_is_a_400_not_a_500(client, user_id, foreign_keys):
+    with SessionLocal() as db:
+        creator = db.get(dbm.User, UUID(user_id))
+        doomed = dbm.User(first_name="Gone", email="gone@example.com",
+                          department_id=creator.department_id, role_id=creator.role_id)
+        db.add(doomed)
+        db.commit()
+        doomed_id = str(doomed.id)
+    item = {"title": "needs doomed", "created_by": user_id, "assignee_ids": [doomed_id]}
+    assert client.post("/todos/bulk", json={"items": [item]}).json()["succeeded"] == 1  # now cached
+
+    # Another replica deletes the user: a Core delete fires no ORM event, so our cache keeps it
+    with engine.begin() as conn:
+        conn.execute(delete(dbm.TaskAssignee.__table__).where(dbm.TaskAssignee.user_id == UUID(doomed_id)))
+        conn.execute(delete(dbm.User.__table__).where(dbm.User.id == UUID(doomed_id)))
+
+    response = client.post("/todos/bulk", json={"items": [item]})
+    assert response.status_code == 400, response.text
+
+    # The stale entry is gone, so the retry reports the bad item instead of failing the batch
+    retry = client.post("/todos/bulk", json={"items": [item]})
+    assert retry.status_code == 200, retry.text
+    assert retry.json()["results"][0]["error"] == "One or more assignee_ids are invalid"
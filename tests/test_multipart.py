@@ -0,0 +1,64 @@
+# tests/test_multipart.py
+from uuid import UUID
+
+from app_db import models as dbm
+from app_db.database import SessionLocal
+from core.config import settings
+
+MiB = 1024 * 1024
+ADMIN_TOKEN = "test-admin-token"
+
+
+def _initiate(client, task_id, size_bytes=8 * MiB):
+    response = client.post(
+        f"/attachments/tasks/{task_id}/multipart/initiate",
+        json={"filename": "big.bin", "content_type": "application/octet-stream", "size_bytes": size_bytes},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _task_counters(task_id):
+    with SessionLocal() as db:
+        task = db.get(dbm.Task, UUID(task_id))
+        return task.attachment_count, task.attachment_bytes
+
+
+def test_abort_stale_deletes_pending_attachments(client, task_id, s3, monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", ADMIN_TOKEN)
+    stale = _initiate(client, task_id)
+    done = _initiate(client, task_id)
+    # Pending uploads are neither counted nor listed until they complete
+    assert _task_counters(task_id) == (0, 0)
+    assert client.get(f"/attachments/tasks/{task_id}").json() == []
+    etag = s3.upload_part(
+        Bucket=settings.aws_s3_bucket, Key=done["key"], UploadId=done["upload_id"], PartNumber=1, Body=b"x" * 1024,
+    )["ETag"]
+    completed = client.post(
+        f"/attachments/tasks/{task_id}/multipart/{done['attachment_id']}/complete",
+        json={"upload_id": done["upload_id"], "parts": [{"part_number": 1, "etag": etag}]},
+    )
+    assert completed.status_code == 200, completed.text
+    assert _task_counters(task_id) == (1, 1024)  # the size that landed, not the announced 8 MiB
+    assert [a["id"] for a in client.get(f"/attachments/tasks/{task_id}").json()] == [done["attachment_id"]]
+
+    response = client.post("/attachments/multipart/abort-stale", params={"older_than_seconds": 0},
+                           headers={"X-Admin-Token": ADMIN_TOKEN})
+    assert response.status_code == 200, response.text
+    assert response.json()["aborted"] == 1
+    assert response.json()["attachments_deleted"] == 1
+
+    assert s3.list_multipart_uploads(Bucket=settings.aws_s3_bucket).get("Uploads", []) == []
+    with SessionLocal() as db:
+        assert db.get(dbm.Attachment, UUID(stale["attachment_id"])) is None
+        assert db.get(dbm.Attachment, UUID(done["attachment_id"])) is not None
+    assert _task_counters(task_id) == (1, 1024)
+
+
+def test_abort_stale_requires_the_admin_token(client, s3, monkeypatch):
+    endpoint = "/attachments/multipart/abort-stale"
+    assert client.post(endpoint).status_code == 403  # no ADMIN_TOKEN configured: closed
+
+    monkeypatch.setattr(settings, "admin_token", ADMIN_TOKEN)
+    assert client.post(endpoint).status_code == 403
+    assert client.post(endpoint, headers={"X-Admin-Token": "wrong"}).status_code == 403
@@ -0,0 +1,69 @@
+# tests/test_presign_upload.py
+import hashlib
+from uuid import UUID
+
+from app_db import models as dbm
+from app_db.database import SessionLocal
+from core.config import settings
+from services.outbox import drain_once
+
+CONTENT = b"same bytes, uploaded twice" * 100
+SHA256 = hashlib.sha256(CONTENT).hexdigest()
+
+
+def _presign_and_upload(client, s3, task_id, body=CONTENT):
+    presigned = client.post(f"/attachments/tasks/{task_id}/presign-upload", json={
+        "filename": "notes.txt", "content_type": "text/plain", "size_bytes": len(CONTENT), "sha256": SHA256,
+    })
+    assert presigned.status_code == 200, presigned.text
+    presigned = presigned.json()
+    # What the browser's POST to the presigned form does (moto does not check the form policy)
+    s3.put_object(Bucket=settings.aws_s3_bucket, Key=presigned["key"], Body=body, ChecksumAlgorithm="SHA256")
+    return presigned
+
+
+def _attachment(attachment_id):
+    with SessionLocal() as db:
+        return db.get(dbm.Attachment, UUID(attachment_id))
+
+
+def test_identical_uploads_share_one_blob_after_verification(client, task_id, s3):
+    first = _presign_and_upload(client, s3, task_id)
+    second = _presign_and_upload(client, s3, task_id)
+    assert first["key"] != second["key"]  # nothing is shared before the bytes are checked
+    pending = client.post("/attachments/download-urls", json={"attachment_ids": [first["attachment_id"]]})
+    assert pending.json()["missing"] == [first["attachment_id"]]  # not downloadable until /complete
+
+    for presigned in (first, second, second):  # a repeated /complete is a no-op
+        response = client.post(f"/attachments/{presigned['attachment_id']}/complete")
+        assert response.status_code == 200, response.text
+        assert response.json()["sha256"] == SHA256
+
+    a, b = _attachment(first["attachment_id"]), _attachment(second["attachment_id"])
+    assert a.storage_key == b.storage_key
+    assert a.blob_sha256 == b.blob_sha256 == SHA256
+    with SessionLocal() as db:
+        assert db.get(dbm.Blob, SHA256).ref_count == 2
+
+    # Both upload copies are redundant once linked; the outbox removes them
+    while drain_once()["claimed"]:
+        pass
+    keys = [o["Key"] for o in s3.list_objects_v2(Bucket=settings.aws_s3_bucket)["Contents"]]
+    assert keys == [a.storage_key]
+
+
+def test_complete_rejects_content_that_does_not_match(client, task_id, s3):
+    presigned = _presign_and_upload(client, s3, task_id, body=b"something else")
+
+    response = client.post(f"/attachments/{presigned['attachment_id']}/complete")
+    assert response.status_code == 422, response.text
+    assert _attachment(presigned["attachment_id"]).blob_sha256 is None
+
+
+def test_complete_before_upload_is_a_conflict(client, task_id, s3):
+    presigned = client.post(f"/attachments/tasks/{task_id}/presign-upload", json={
+        "filename": "notes.txt", "sha256": SHA256,
+    }).json()
+
+    response = client.post(f"/attachments/{presigned['attachment_id']}/complete")
+    assert response.status_code == 409, response.text
@@ -0,0 +1,15 @@
+# tests/test_search.py
+import pytest
+
+
+def test_search_finds_task_by_title_term(client, user_id):
+    created = client.post("/todos/", json={"title": "quarterly zebra report", "created_by": user_id}).json()
+    response = client.get("/todos/search", params={"q": "  zebra  "})
+    assert response.status_code == 200, response.text
+    assert [t["id"] for t in response.json()] == [created["id"]]
+
+
+@pytest.mark.parametrize("q", [" ", "   ", "\t"])
+def test_search_rejects_blank_query(client, q):
+    response = client.get("/todos/search", params={"q": q})
+    assert response.status_code == 400, response.text
@@ -0,0 +1,69 @@
+# tests/test_task_reads.py
+from contextlib import contextmanager
+from uuid import UUID
+
+import pytest
+from sqlalchemy import event
+
+from app_db import models as dbm
+from app_db.database import SessionLocal, engine
+from core.config import settings
+from services.cache import invalidate_lookups
+
+N_TASKS = 25
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+
+@pytest.fixture(scope="module")
+def tagged_tasks(client, user_id):
+    """N_TASKS tasks sharing one tag (the filter), each with its own assignee and extra tag."""
+    with SessionLocal() as db:
+        user = db.get(dbm.User, UUID(user_id))
+        assignees = [
+            dbm.User(first_name=f"A{i}", email=f"reads-a{i}@example.com",
+                     department_id=user.department_id, role_id=user.role_id)
+            for i in range(N_TASKS)
+        ]
+        tags = [dbm.Tag(name=f"reads-{i}") for i in range(N_TASKS + 1)]
+        db.add_all(assignees + tags)
+        db.commit()
+        assignee_ids = [str(a.id) for a in assignees]
+        tag_ids = [str(t.id) for t in tags]
+    for i in range(N_TASKS):
+        response = client.post("/todos/", json={
+            "title": f"read {i}", "created_by": user_id,
+            "assignee_ids": [assignee_ids[i]], "tag_ids": [tag_ids[-1], tag_ids[i]],
+        })
+        assert response.status_code in (200, 201), response.text
+    return tag_ids[-1]
+
+
+def _statements_for_page(client, tag_id, limit):
+    invalidate_lookups()  # cold user/tag cache every time: lookups must be batched, not cached
+    with count_statements() as statements:
+        response = client.get("/todos/", params={"tag_id": tag_id, "limit": limit})
+    assert response.status_code == 200, response.text
+    page = response.json()
+    assert len(page) == limit
+    assert all(len(t["assignee_ids"]) == 1 and len(t["tag_ids"]) == 2 for t in page)
+    return len(statements)
+
+
+@pytest.mark.parametrize("fast_lists", [True, False])
+def test_list_tasks_statement_count_is_independent_of_page_size(client, tagged_tasks, monkeypatch, fast_lists):
+    monkeypatch.setattr(settings, "fast_task_lists", fast_lists)
+    counts = {limit: _statements_for_page(client, tagged_tasks, limit) for limit in (1, 5, N_TASKS)}
+    assert len(set(counts.values())) == 1, counts